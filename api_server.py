@@ -10,12 +10,8 @@ from fastapi import FastAPI, HTTPException
 from fastapi.middleware.cors import CORSMiddleware
 from pydantic import BaseModel, Field
 import numpy as np
-import base64
-import io
-import wave
 from typing import List, Optional
-import spec001 as spg
-from simuvox_api import SimuVoxEngine, VoiceParameters
+from simuvox_api import SimuVoxEngine, VoiceParameters, PRESETS
 
 app = FastAPI(
     title="SimuVox API",
@@ -53,6 +49,7 @@ class SynthesisRequest(BaseModel):
     onset_time: float = Field(default=0.3, ge=0.1, le=1.0, description="Onset time (s)")
     offset_time: float = Field(default=0.15, ge=0.05, le=1.0, description="Offset time (s)")
     pitch_decrease: bool = Field(default=False, description="10% pitch decrease")
+    seed: Optional[int] = Field(default=None, ge=0, description="Noise seed for reproducible audio")
     
     # Gender
     gender: str = Field(default="Male", description="'Male' or 'Female'")
@@ -159,6 +156,7 @@ async def synthesize_voice(request: SynthesisRequest):
             onset_time=request.onset_time,
             offset_time=request.offset_time,
             pitch_decrease=request.pitch_decrease,
+            seed=request.seed,
             gender=request.gender,
             asymmetry=request.asymmetry,
             wow=request.wow,
@@ -179,45 +177,46 @@ async def synthesize_voice(request: SynthesisRequest):
                 error_message=result.error_message
             )
         
-        # Convert audio to WAV format in memory
-        audio_bytes = io.BytesIO()
-        with wave.open(audio_bytes, 'wb') as wav_file:
-            wav_file.setnchannels(1)
-            wav_file.setsampwidth(2)  # 16-bit
-            wav_file.setframerate(result.sample_rate)
-            # Normalize and convert to int16
-            audio_normalized = result.audio / np.max(np.abs(result.audio))
-            audio_int16 = (audio_normalized * 32767).astype(np.int16)
-            wav_file.writeframes(audio_int16.tobytes())
-        
-        # Encode as base64
-        audio_base64 = base64.b64encode(audio_bytes.getvalue()).decode()
+        # Encoded audio, plot series and spectrogram are derived artifacts of the
+        # result: computed once, then reused by requests that hit the same
+        # synthesis (e.g. only the downsample factor changed)
+        audio_base64 = result.get_wav_base64()
                 
         # Downsample time series for efficient transmission
         ds = request.downsample_factor
-        time_ds = result.time[::ds]
-
-        # Extract vocal fold displacements
-        vf_left = -result.vocal_fold_displacement[::ds, 0]
-        vf_right = result.vocal_fold_displacement[::ds, 1]
-
-        # Compute spectrogram - NO downsampling
-        ims, fm1 = spg.get_ims(result.audio, window_length=0.050, overlap=0.92)
-        vv = np.max(ims)
-        ims_full = ims.clip(min=vv-50.)
-
-        # Normalize to 0-50 range for better color mapping
-        ims_normalized = ims_full - (vv - 50.)
-
-        print(f"Spectrogram shape BEFORE transpose: {ims_normalized.shape}")
-        print(f"Max frequency: {fm1} Hz")
-        print(f"Duration: {len(result.audio) / result.sample_rate} s")
-        print(f"Spectrogram value range: {ims_normalized.min():.1f} to {ims_normalized.max():.1f}")
-
-        # Transpose so that rows=frequency, cols=time
-        ims_transposed = ims_normalized.T
-
-        print(f"Spectrogram shape AFTER transpose: {ims_transposed.shape}")
+        waveform_lists = result.derived(("waveform_lists", ds), lambda: {
+            "time": result.get_downsampled("time", ds).tolist(),
+            "glottal_area": result.get_downsampled("glottal_area", ds).tolist(),
+            "glottal_flow": (result.get_downsampled("glottal_flow", ds) / 1000).tolist(),
+            # Extract vocal fold displacements
+            "vocal_fold_left": (-result.vocal_fold_displacement[::ds, 0]).tolist(),
+            "vocal_fold_right": result.vocal_fold_displacement[::ds, 1].tolist(),
+            "acoustic_pressure": (result.get_downsampled("audio", ds) / 10).tolist(),
+        })
+
+        # Spectrogram - NO downsampling
+        def display_spectrogram():
+            ims, fm1 = result.get_spectrogram(window_length=0.050, overlap=0.92)
+            vv = np.max(ims)
+            ims_full = ims.clip(min=vv-50.)
+
+            # Normalize to 0-50 range for better color mapping
+            ims_normalized = ims_full - (vv - 50.)
+
+            print(f"Spectrogram shape BEFORE transpose: {ims_normalized.shape}")
+            print(f"Max frequency: {fm1} Hz")
+            print(f"Duration: {len(result.audio) / result.sample_rate} s")
+            print(f"Spectrogram value range: {ims_normalized.min():.1f} to {ims_normalized.max():.1f}")
+
+            # Transpose so that rows=frequency, cols=time
+            ims_transposed = ims_normalized.T
+
+            print(f"Spectrogram shape AFTER transpose: {ims_transposed.shape}")
+            
+            return ims_transposed.tolist(), fm1
+        
+        spectrogram_list, fm1 = result.derived(("spectrogram_display", 0.050, 0.92, 50.),
+                                               display_spectrogram)
 
         return SynthesisResponse(
             success=True,
@@ -233,14 +232,9 @@ async def synthesize_voice(request: SynthesisRequest):
             sample_rate=result.sample_rate,
             duration_actual=len(result.audio) / result.sample_rate,
              waveforms=WaveformData(
-                time=time_ds.tolist(),
-                glottal_area=result.glottal_area[::ds].tolist(),
-                glottal_flow=(result.glottal_flow[::ds] / 1000).tolist(),
-                vocal_fold_left=vf_left.tolist(),
-                vocal_fold_right=vf_right.tolist(),
-                acoustic_pressure=(result.audio[::ds] / 10).tolist(), 
-                spectrogram=ims_transposed.tolist(),
-                spectrogram_freq_max=fm1/1000.0
+                spectrogram=spectrogram_list,
+                spectrogram_freq_max=fm1/1000.0,
+                **waveform_lists
             )
         )
         
@@ -256,23 +250,9 @@ async def get_presets(gender: str):
     Get default parameter presets for male or female voice.
     """
     if gender.lower() == "male":
-        return {
-            "gender": "Male",
-            "mass": 0.2,
-            "damping": 0.025,
-            "stiffness": 90.0,
-            "glottal_length": 1.4,
-            "glottal_depth": 0.3
-        }
+        return dict(gender="Male", **PRESETS["Male"])
     elif gender.lower() == "female":
-        return {
-            "gender": "Female",
-            "mass": 0.12,
-            "damping": 0.015,
-            "stiffness": 185.0,
-            "glottal_length": 1.0,
-            "glottal_depth": 0.25
-        }
+        return dict(gender="Female", **PRESETS["Female"])
     else:
         raise HTTPException(status_code=400, detail="Gender must be 'male' or 'female'")
 
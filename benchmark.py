@@ -0,0 +1,315 @@
+# -*- coding: utf-8 -*-
+
+"""
+Timing benchmarks of the synthesis, the analysis functions and the web API, with
+machine-readable results and a comparison against a stored baseline.
+
+Cases, all with fixed seeds:
+
+    voice/<mode>/<losses>/<gender>/<duration>
+                    Synthesis.get_voice of the preset (simuvox_api.PRESETS);
+                    mode is the SAMPLING_MODE (1: 88200 Hz,
+                    2: 44100 Hz, 3: 44100 Hz with the tract half-sampled), losses
+                    is none, visc, wall or both, duration is in seconds
+    formants        lam.Lam.get_formants of the default tract
+    spectrogram     spec001.get_ims of the reference voice (male, 1.5 s)
+    spectral        spectral_par.compute_balance_and_ratio of its glottal flow
+    sound_file      sound_output.get_sound_file of its audio
+    api_synthesize  POST /api/synthesize (api_server) through the FastAPI test
+                    client, with an engine without result cache or warm start
+
+Each case runs repeat times after an untimed run (kernel compilation, tract
+responses, imports). The results file holds the minimum, median and all times
+of each case, with the platform, library versions and code version
+(result_cache.code_version) of the run. A case whose module cannot be imported
+(e.g. fastapi, tkinter) is recorded as skipped.
+
+compare flags the cases whose minimum time grew by more than the tolerance
+(default 15%) relative to the baseline, and exits with status 1 if there is
+any. Baselines are only comparable on the machine where they were measured.
+
+Usage:
+    python benchmark.py run [-o results.json] [-r 3] [-k voice/3/]
+    python benchmark.py run --save-baseline
+    python benchmark.py compare [results.json] [-b benchmark_baseline.json] [-t 0.15]
+"""
+
+import sys
+import json
+import time
+import random
+import argparse
+import platform
+import datetime
+import numpy             as np
+import config            as cfg
+import synthesis         as syn
+import simuvox_api       as api
+import spectral_par      as sp
+import result_cache      as rc
+import vt_data           as vtd
+
+
+SEED          = 1
+RESULTS_FILE  = "benchmark_results.json"
+BASELINE_FILE = "benchmark_baseline.json"
+TOLERANCE     = 0.15
+
+SAMPLING_MODES = (1, 2, 3)
+LOSSES         = {"none": (False, False), "visc": (True, False), "wall": (False, True),
+                  "both": (True, True)}
+GENDERS        = ("Male", "Female")
+DURATIONS      = (0.75, 1.5)
+
+
+def _voice_config(engine, mode, losses, gender, duration):
+
+    (visc, wall) = LOSSES[losses]
+    params       = api.VoiceParameters(gender=gender, duration=duration, seed=SEED,
+                                       jitter=1., viscous_loss=visc, wall_vibration=wall,
+                                       **api.PRESETS[gender])
+
+    return engine._configure(params).replace(SAMPLING_MODE=mode)
+
+
+def _voice_case(config):
+
+    return lambda: syn.Synthesis(config).get_voice()
+
+
+def _reference(engine):
+
+    # Signals of the reference voice, input of the analysis cases
+
+    config        = _voice_config(engine, 3, "none", "Male", 1.5)
+    synthesis_obj = syn.Synthesis(config)
+    p_end         = synthesis_obj.get_voice()
+
+    return config, p_end, synthesis_obj.get_glottal()[2]
+
+
+def _formants_case():
+
+    import lam
+
+    # The formants only need the tubes of the tract, not the window of Lam
+
+    lam_obj       = lam.Lam.__new__(lam.Lam)
+    lam_obj.tubes = vtd.MakeVT(cfg.get_config(None)).AREA
+    lam_obj.res_f = np.zeros(6)
+
+    return lam_obj.get_formants
+
+
+def _spectrogram_case(config, p_end, ug):
+
+    from spec001 import get_ims
+
+    return lambda: get_ims(p_end, config=config)
+
+
+def _spectral_case(config, p_end, ug):
+
+    return lambda: sp.compute_balance_and_ratio(ug, config)
+
+
+def _sound_file_case(config, p_end, ug):
+
+    import sound_output
+
+    # get_sound_file normalizes its input in place and dithers with random
+
+    def run():
+        random.seed(SEED)
+        sound_output.get_sound_file(p_end.copy(), config)
+
+    return run
+
+
+def _api_case():
+
+    from fastapi.testclient import TestClient
+    import api_server
+
+    api_server.engine = api.SimuVoxEngine(cache=False, warm_start=False)
+    client            = TestClient(api_server.app)
+
+    def run():
+        response = client.post("/api/synthesize", json={"seed": SEED, "duration": 1.5})
+        if response.status_code != 200 or not response.json()["success"]:
+            raise RuntimeError("/api/synthesize failed: %s" % response.text[:200])
+
+    return run
+
+
+def get_cases():
+
+    """ Ordered list of (name, factory), where factory() returns the function to time """
+
+    engine = api.SimuVoxEngine(cache=False, warm_start=False)
+    cases  = []
+
+    for mode in SAMPLING_MODES:
+        for losses in LOSSES:
+            for gender in GENDERS:
+                for duration in DURATIONS:
+                    config = _voice_config(engine, mode, losses, gender, duration)
+                    cases.append(("voice/%d/%s/%s/%g" % (mode, losses, gender, duration),
+                                  lambda config=config: _voice_case(config)))
+
+    # The analysis cases share the signals of the reference voice
+
+    reference = []
+
+    def with_reference(case):
+        def factory():
+            if not reference:
+                reference.append(_reference(engine))
+            return case(*reference[0])
+        return factory
+
+    cases.append(("formants", _formants_case))
+    cases.append(("spectrogram", with_reference(_spectrogram_case)))
+    cases.append(("spectral", with_reference(_spectral_case)))
+    cases.append(("sound_file", with_reference(_sound_file_case)))
+    cases.append(("api_synthesize", _api_case))
+
+    return cases
+
+
+def _versions():
+
+    versions = {"python": platform.python_version(), "numpy": np.__version__}
+    for name in ("numba", "scipy", "fastapi"):
+        try:
+            versions[name] = __import__(name).__version__
+        except ImportError:
+            versions[name] = None
+
+    return versions
+
+
+def run(repeat=3, match=None, output=RESULTS_FILE, verbose=True):
+
+    """ Times the cases whose name contains match (all by default) and writes the
+        results to output. Returns the results dictionary """
+
+    results = {"created":      datetime.datetime.now().isoformat(timespec="seconds"),
+               "platform":     platform.platform(),
+               "processor":    platform.processor(),
+               "versions":     _versions(),
+               "code_version": rc.code_version(),
+               "repeat":       repeat,
+               "cases":        {}}
+
+    for (name, factory) in get_cases():
+
+        if match is not None and match not in name:
+            continue
+
+        try:
+            function = factory()
+        except ImportError as e:
+            results["cases"][name] = {"skipped": str(e)}
+            if verbose:
+                print("%-32s skipped (%s)" % (name, e))
+            continue
+
+        function()
+        times = []
+        for i in range(repeat):
+            start = time.perf_counter()
+            function()
+            times.append(time.perf_counter() - start)
+
+        results["cases"][name] = {"min":    min(times),
+                                  "median": float(np.median(times)),
+                                  "times":  times}
+        if verbose:
+            print("%-32s min %9.4f s  median %9.4f s" % (name, min(times), np.median(times)))
+
+    if output is not None:
+        with open(output, "w") as results_file:
+            json.dump(results, results_file, indent=1)
+
+    return results
+
+
+def compare(current, baseline, tolerance=TOLERANCE):
+
+    """ Comparison of two results dictionaries. Returns a list of (name, baseline
+        time, current time, ratio, status) with status "regression", "faster",
+        "ok", "new", "missing" or "skipped" """
+
+    rows = []
+    for name in list(baseline["cases"]) + [name for name in current["cases"]
+                                           if name not in baseline["cases"]]:
+        old = baseline["cases"].get(name, {}).get("min")
+        new = current["cases"].get(name, {}).get("min")
+
+        if name not in current["cases"]:
+            rows.append((name, old, None, None, "missing"))
+        elif old is None or new is None:
+            status = "new" if name not in baseline["cases"] else "skipped"
+            rows.append((name, old, new, None, status))
+        else:
+            ratio  = new/old
+            status = ("regression" if ratio > 1. + tolerance else
+                      "faster" if ratio < 1./(1. + tolerance) else "ok")
+            rows.append((name, old, new, ratio, status))
+
+    return rows
+
+
+def format_comparison(rows):
+
+    lines = ["%-32s %10s %10s %7s  %s" % ("case", "base (s)", "now (s)", "ratio", "status")]
+
+    for (name, old, new, ratio, status) in rows:
+        lines.append("%-32s %10s %10s %7s  %s" %
+                     (name, "-" if old is None else "%.4f" % old,
+                      "-" if new is None else "%.4f" % new,
+                      "-" if ratio is None else "%.2f" % ratio, status))
+
+    return "\n".join(lines)
+
+
+def _load(path):
+
+    with open(path) as results_file:
+        return json.load(results_file)
+
+
+def main(argv=None):
+
+    parser   = argparse.ArgumentParser(description="SimuVox timing benchmarks")
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    run_parser = commands.add_parser("run", help="time the cases and write the results")
+    run_parser.add_argument("-o", "--output", default=RESULTS_FILE)
+    run_parser.add_argument("-r", "--repeat", type=int, default=3)
+    run_parser.add_argument("-k", "--match", default=None,
+                            help="only the cases whose name contains this text")
+    run_parser.add_argument("--save-baseline", action="store_true",
+                            help="write the results to the baseline file instead")
+
+    compare_parser = commands.add_parser("compare", help="flag regressions against a baseline")
+    compare_parser.add_argument("results", nargs="?", default=RESULTS_FILE)
+    compare_parser.add_argument("-b", "--baseline", default=BASELINE_FILE)
+    compare_parser.add_argument("-t", "--tolerance", type=float, default=TOLERANCE)
+
+    args = parser.parse_args(argv)
+
+    if args.command == "run":
+        run(args.repeat, args.match, BASELINE_FILE if args.save_baseline else args.output)
+        return 0
+
+    rows = compare(_load(args.results), _load(args.baseline), args.tolerance)
+    print(format_comparison(rows))
+
+    return 1 if any(row[4] == "regression" for row in rows) else 0
+
+
+if __name__ == "__main__":
+
+    sys.exit(main())
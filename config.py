@@ -9,6 +9,18 @@ import numpy   as np
 #import os
 #from   os.path import expanduser
 
+
+def sampling(mode):
+
+    """ Decimation factor, sampling frequency and half-sampling flag of a sampling mode """
+
+    if mode == 1:
+        return 2, 88200., "No"
+    elif mode == 2:
+        return 1, 44100., "No"
+    else:
+        return 1, 44100., "Yes"
+
     
 class Constant(object):
 
@@ -54,23 +66,7 @@ class Param(object):
 
     SAMPLING_MODE   = 3      # 1: 88200 Hz, 2: 44100 Hz, 3: 44100 Hz and half-sampling for the vt
 
-    if SAMPLING_MODE == 1:
-
-        DECIMATE      = 2
-        FS            = 88200.
-        HALF_SAMPLING = "No"
-
-    elif SAMPLING_MODE == 2:
-        
-        DECIMATE      = 1
-        FS            = 44100.
-        HALF_SAMPLING = "No"
-
-    else: 
-        
-        DECIMATE      = 1
-        FS            = 44100.
-        HALF_SAMPLING = "Yes"
+    DECIMATE, FS, HALF_SAMPLING = sampling(SAMPLING_MODE)
            
     DELTA_T         = 1./FS                     # s 
     SQRT_DELTA_T    = np.sqrt(DELTA_T)
@@ -82,6 +78,18 @@ class Param(object):
             
     MAXFREQ         = 1000.                     # Max frequency for computing cycle lengths, in Hz
 
+    FUSED_KERNEL    = True     # Single-loop kernel (numba-compiled if installed) when the options allow it
+    SCALAR_FOLDS    = True     # Fold model with scalar state in the Python loop (vocal_folds.ScalarVFmodel)
+    FOLD_INTEGRATOR = "euler"  # "semi-implicit": damping and stiffness implicit in the fold step (needs SCALAR_FOLDS)
+    FOLD_SUBSTEP    = 1        # Fold step every FOLD_SUBSTEP samples, flow at every sample (euler only, integrator.py)
+    PRECOMPUTED_NOISE = False  # Generate the perturbation and aspiration noise streams up front
+    SEED            = None     # Seed of the per-run noise streams (None: global np.random state)
+    DTYPE           = "float64"  # Tract waves and stored signals; "float32" for single precision
+    TRACT_ENGINE    = "waveguide"  # "reflectance": precomputed glottis-to-tract responses (vocal_tract.ReflectanceVT)
+    UNCOUPLED       = False    # Fast approximation: source against a low-order load, then the tract as a filter (uncoupled.py)
+    AREA_TRAJECTORY = None     # Vocal tract areas (tubes x frames) at frames spread evenly over TIME_TOTAL, or None
+    PROFILE_EVERY   = 0        # Time the stages of every PROFILE_EVERY-th sample of the Python loop, used even where the kernel would be (profiler.py); 0: off
+
     LIPS_FR         = True     # Flanagan & Rabiner's (1972) model for lip reflexion/transmission
     VISC_LOSS       = False    # Acoustic losses for thermal conduction and air viscosity
     WALL_VIBR       = False   # Acoustic losses for wall vibration
@@ -161,7 +169,76 @@ class Param(object):
     WOW_SCALE        = 0.005
     TREMOR_SCALE     = 0.003
     FLUTTER_SCALE    = 0.0008
-    ASPIRATION_SCALE = .6    
+    ASPIRATION_SCALE = .6
+
+
+class SimulationConfig(object):
+
+    """ Immutable per-run copy of Param.
+
+        Keyword arguments override single parameters; all others are taken from Param
+        at construction time. Later changes to Param do not affect an existing
+        SimulationConfig, so concurrent runs can each carry their own. """
+
+    def __init__(self, **overrides):
+
+        values = dict((name, getattr(Param, name)) for name in dir(Param) if name.isupper())
+
+        self._set(values, overrides)
+
+    def _set(self, values, overrides):
+
+        for name in overrides:
+            if name not in values:
+                raise AttributeError("Unknown parameter: " + name)
+
+        values.update(overrides)
+
+        if "SAMPLING_MODE" in overrides:
+            (values["DECIMATE"], values["FS"],
+             values["HALF_SAMPLING"]) = sampling(values["SAMPLING_MODE"])
+
+        if any(name in overrides for name in ("SAMPLING_MODE", "FS", "HALF_SAMPLING")):
+            values["DELTA_T"]       = 1./values["FS"]
+            values["SQRT_DELTA_T"]  = np.sqrt(values["DELTA_T"])
+            values["LTUBE"]         = Constant.SOUND_SPEED/values["FS"]
+            values["LTUBE_TRACHEA"] = values["LTUBE"]
+            if values["HALF_SAMPLING"] == "Yes":
+                values["LTUBE"] = values["LTUBE"]/2.
+
+        for name, value in values.items():
+            if isinstance(value, np.ndarray):
+                value = value.copy()
+                value.flags.writeable = False
+            object.__setattr__(self, name, value)
+
+    def __setattr__(self, name, value):
+
+        raise AttributeError("SimulationConfig is immutable; use replace()")
+
+    def __delattr__(self, name):
+
+        raise AttributeError("SimulationConfig is immutable")
+
+    def as_dict(self):
+
+        return dict(self.__dict__)
+
+    def replace(self, **changes):
+
+        """ New SimulationConfig with the given parameters changed """
+
+        config = object.__new__(SimulationConfig)
+        config._set(self.as_dict(), changes)
+
+        return config
+
+
+def get_config(config=None):
+
+    """ The given per-run configuration, or a snapshot of Param if there is none """
 
+    if config is None:
+        return SimulationConfig()
 
-     
+    return config
@@ -0,0 +1,170 @@
+# -*- coding: utf-8 -*-
+
+"""
+Cycle boundaries and open quotients of the synthesized voice, detected on blocks
+of the stored fold displacement and glottal area after they are computed.
+
+A cycle starts at each upward zero crossing of the displacement of the first
+fold, placed by linear interpolation between the two samples. The open quotient
+of a cycle is the time from the last glottal opening to a closing over the time
+since the previous closing, with the glottis open above 1e-4 cm^2. Only samples
+between nstart and nend (exclusive) count, and at most cycles values of each
+measure are kept; CycleDetector counts the ones left out, which Synthesis
+reports once per run as a CycleLimitWarning. The detector carries the last
+samples and events from block to block, so that any split of the signals gives
+the same values.
+"""
+
+import numpy             as np
+
+
+OPEN_AREA = .0001         # cm^2
+
+
+class CycleLimitWarning(UserWarning):
+
+    def __init__(self, limit, dropped_cycles, dropped_oq):
+
+        """ Cycle measures left out beyond the limit of limit values (MAXFREQ times
+            the voiced duration) """
+
+        self.limit          = limit
+        self.dropped_cycles = dropped_cycles
+        self.dropped_oq     = dropped_oq
+
+        UserWarning.__init__(self, "%d cycle boundaries and %d open quotients beyond the limit of "
+                             "%d were left out of the measures; increase MAXFREQ" %
+                             (dropped_cycles, dropped_oq, limit))
+
+
+class CycleDetector(object):
+
+    def __init__(self, nstart, nend, cycles, delta_t):
+
+        """ Detector for the samples n with nstart < n < nend, keeping at most
+            cycles values of each measure """
+
+        self.__nstart  = nstart
+        self.__nend    = nend
+        self.__cycles  = cycles
+        self.__delta_t = delta_t
+        self.reset()
+
+    def reset(self):
+
+        self.__tcycle  = []
+        self.__oqcycle = []
+        self.__icycle  = 0
+        self.__noq     = 0
+        self.__dropped = [0, 0]
+        self.__iop1    = 0                # Last closing and opening, 0 before the first
+        self.__iop2    = 0
+        self.__ag_last = 0.
+        self.__w0_last = 0.
+
+    def process(self, n0, w0, ag):
+
+        """ Measures in the samples n0 to n0 + w0.size - 1, following the previous
+            call """
+
+        w0     = np.asarray(w0, dtype=float)
+        ag     = np.asarray(ag, dtype=float)
+        if w0.size == 0:
+            return
+
+        n      = np.arange(n0, n0 + w0.size)
+        w_prev = np.concatenate(([self.__w0_last], w0[:-1]))
+        a_prev = np.concatenate(([self.__ag_last], ag[:-1]))
+        window = (n > self.__nstart) & (n < self.__nend)
+
+        self.__w0_last = w0[-1]
+        self.__ag_last = ag[-1]
+
+        if not window.any():
+            return
+
+        # Cycle boundaries
+
+        up     = np.flatnonzero(window & (w0 >= 0.) & (w_prev < 0.))
+        take   = min(up.size, self.__cycles - self.__icycle)
+        self.__dropped[0] += up.size - take
+
+        up     = up[:take]
+        if take > 0:
+            self.__tcycle.append((w0[up]*(n[up] - 1) - w_prev[up]*n[up])*self.__delta_t/
+                                 (w0[up] - w_prev[up]))
+            self.__icycle += take
+
+        # Open quotients, one per closing after a previous closing and an opening
+
+        closing = n[window & (ag <= OPEN_AREA) & (a_prev > OPEN_AREA)]
+        opening = n[window & (ag > OPEN_AREA) & (a_prev <= OPEN_AREA)]
+
+        if closing.size > 0:
+            index    = np.searchsorted(opening, closing) - 1
+            last     = np.where(index >= 0, opening[np.maximum(index, 0)] if opening.size > 0
+                                else 0, self.__iop2)
+            previous = np.concatenate(([self.__iop1], closing[:-1]))
+            valid    = (previous > 0) & (last > 0)
+
+            oq       = ((closing - last)/(closing - previous).astype(float))[valid]
+            take     = min(oq.size, self.__cycles - self.__noq)
+            self.__dropped[1] += oq.size - take
+            if take > 0:
+                self.__oqcycle.append(oq[:take])
+                self.__noq += take
+
+            self.__iop1 = closing[-1]
+
+        if opening.size > 0:
+            self.__iop2 = opening[-1]
+
+    def get_cycles(self):
+
+        """ Cycle start times (s) and open quotients found so far """
+
+        return (np.concatenate([np.zeros(0)] + self.__tcycle),
+                np.concatenate([np.zeros(0)] + self.__oqcycle))
+
+    def get_dropped(self):
+
+        """ Numbers of cycle boundaries and open quotients left out beyond the limit """
+
+        return tuple(self.__dropped)
+
+    def get_limit_warning(self):
+
+        """ CycleLimitWarning for the values left out, or None """
+
+        if self.__dropped == [0, 0]:
+            return None
+
+        return CycleLimitWarning(self.__cycles, *self.__dropped)
+
+    def get_state(self):
+
+        (tcycle, oqcycle) = self.get_cycles()
+
+        return {"tcycle":  tcycle,
+                "oqcycle": oqcycle,
+                "dropped": tuple(self.__dropped),
+                "last":    (self.__iop1, self.__iop2, self.__ag_last, self.__w0_last)}
+
+    def set_state(self, state):
+
+        self.__tcycle  = [state["tcycle"].copy()]
+        self.__oqcycle = [state["oqcycle"].copy()]
+        self.__icycle  = state["tcycle"].size
+        self.__noq     = state["oqcycle"].size
+        self.__dropped = list(state["dropped"])
+        (self.__iop1, self.__iop2, self.__ag_last, self.__w0_last) = state["last"]
+
+
+def cycle_measures(w0, ag, nstart, nend, cycles, delta_t):
+
+    """ Cycle start times and open quotients of whole signals w0 and ag (from sample 0) """
+
+    detector = CycleDetector(nstart, nend, cycles, delta_t)
+    detector.process(0, w0, ag)
+
+    return detector.get_cycles()
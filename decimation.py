@@ -0,0 +1,90 @@
+# -*- coding: utf-8 -*-
+
+"""
+Anti-aliased decimation of the synthesized signals (SAMPLING_MODE 1 runs at
+88.2 kHz and is played or saved at FS/DECIMATE).
+
+The low-pass filter is a Kaiser-windowed sinc FIR evaluated in polyphase form:
+each of the factor branches filters only the input samples that contribute to
+the kept outputs, so no output that is later discarded is ever computed.
+PolyphaseDecimator keeps its filter history between blocks for streaming;
+decimate() filters a whole signal and compensates the filter delay.
+"""
+
+import numpy             as np
+
+
+def design_lowpass(factor, taps_per_phase=64, cutoff=0.92, beta=8.):
+
+    """ Symmetric low-pass FIR of factor*taps_per_phase - 1 taps with its edge at
+        cutoff times the output Nyquist frequency, unit gain at DC """
+
+    ntaps = factor*taps_per_phase - 1
+    fc    = 0.5*cutoff/factor                       # cycles per input sample
+    n     = np.arange(ntaps) - (ntaps - 1)/2.
+    h     = 2.*fc*np.sinc(2.*fc*n)*np.kaiser(ntaps, beta)
+
+    return h/np.sum(h)
+
+
+class PolyphaseDecimator(object):
+
+    def __init__(self, factor, taps_per_phase=64, cutoff=0.92, beta=8.):
+
+        """ Streaming decimator by the integer factor """
+
+        self.factor   = int(factor)
+        h             = design_lowpass(self.factor, taps_per_phase, cutoff, beta)
+
+        # Zero padded to factor*taps_per_phase taps, so that every phase has the same length
+
+        self.delay    = (h.size - 1)//2                 # in input samples
+        h             = np.append(h, 0.)
+        self.__ntaps  = h.size
+        self.__phases = [h[p::self.factor] for p in range(self.factor)]
+        self.reset()
+
+    def reset(self, skip=0):
+
+        """ Clears the filter history; the first output is at input sample skip """
+
+        self.__history = np.zeros(self.__ntaps - 1)
+        self.__skip    = skip % self.factor
+
+    def process(self, x):
+
+        """ Decimated block, continuing the previous ones """
+
+        x      = np.asarray(x, dtype=float)
+        factor = self.factor
+        count  = max(0, -(-(x.size - self.__skip)//factor))
+        buffer = np.concatenate((self.__history, x))
+
+        y      = np.zeros(count)
+        if count > 0:
+            ntaps_phase = self.__ntaps//factor
+            for p, h_p in enumerate(self.__phases):
+                start = factor - 1 - p + self.__skip
+                s_p   = buffer[start:start + factor*(count + ntaps_phase - 1):factor]
+                y    += np.convolve(s_p, h_p, "valid")
+
+        self.__history = buffer[buffer.size - (self.__ntaps - 1):]
+        self.__skip    = (self.__skip - x.size) % factor
+
+        return y
+
+
+def decimate(x, factor):
+
+    """ x low-pass filtered and taken every factor samples, aligned with x[::factor] """
+
+    x = np.asarray(x)
+    if factor <= 1:
+        return x
+
+    decimator = PolyphaseDecimator(factor)
+    delay     = decimator.delay
+    decimator.reset(skip=delay)
+    y         = decimator.process(np.concatenate((x, np.zeros(delay))))
+
+    return y[delay//factor:].astype(x.dtype, copy=False)
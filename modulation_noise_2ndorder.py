@@ -4,10 +4,67 @@ import numpy             as np
 import reson2order       as r2
 
 
+NOISE_SOURCES = ("aspiration", "wow", "tremor", "flutter")
+
+
+def make_generators(seed=None):
+
+    """ One independent normal stream per noise source, spawned from seed. Without
+        a seed every source draws from the global np.random state """
+
+    if seed is None:
+        return dict((name, np.random) for name in NOISE_SOURCES)
+
+    children = np.random.SeedSequence(seed).spawn(len(NOISE_SOURCES))
+
+    return dict((name, np.random.default_rng(child))
+                for name, child in zip(NOISE_SOURCES, children))
+
+
+def draw_normals(generators, nsamples):
+
+    """ Normal draws of nsamples synthesis steps, shape (nsamples, 7), in the per-sample
+        order aspiration, wow, tremor, flutter of fold 1, wow, tremor, flutter of fold 2 """
+
+    if is_global(generators):
+        return np.random.standard_normal((nsamples, 7))
+
+    dW       = np.empty((nsamples, 7))
+    dW[:,0]  = generators["aspiration"].standard_normal(nsamples)
+    for j, name in ((1, "wow"), (2, "tremor"), (3, "flutter")):
+        dW[:,[j, j+3]] = generators[name].standard_normal((nsamples, 2))
+
+    return dW
+
+
+def is_global(generators):
+
+    return all(generators[name] is np.random for name in NOISE_SOURCES)
+
+
+def get_generator_state(generators):
+
+    if is_global(generators):
+        return np.random.get_state()
+
+    return dict((name, generators[name].bit_generator.state) for name in NOISE_SOURCES)
+
+
+def set_generator_state(generators, state):
+
+    if is_global(generators):
+        np.random.set_state(state)
+    else:
+        for name in NOISE_SOURCES:
+            generators[name].bit_generator.state = state[name]
+
+
 class ModulationNoise(object):
     
-    def __init__(self, fp, bw, fs, tipo) :
+    def __init__(self, fp, bw, fs, tipo, generator=np.random) :
    
+        self.__generator        = generator
+
         if tipo == "reson":
             self.__reson_obj    = r2.TwoPoles(fp, bw, fs)
         if tipo == "reson_z":
@@ -15,11 +72,25 @@ class ModulationNoise(object):
 
     def get_filtered_noise_sample(self):
         
-        dW     = np.random.standard_normal()
+        dW     = self.__generator.standard_normal()
         sample = self.__reson_obj.get_sample(dW)
 
         return sample
 
+    def get_filtered_noise_block(self, dW):
+        
+        """ Filters a whole block of normal draws dW at once (block IIR filtering) """
+
+        return self.__reson_obj.get_block(dW)
+
+    def get_state(self):
+
+        return self.__reson_obj.get_state()
+
+    def set_state(self, state):
+
+        self.__reson_obj.set_state(state)
+
 
 if __name__ == "__main__":
 
@@ -0,0 +1,105 @@
+# -*- coding: utf-8 -*-
+
+"""
+Accuracy of the single-precision pipeline (VoiceParameters.single_precision,
+config DTYPE = "float32") against double precision.
+
+In float32 mode the vocal tract and trachea waves, the reflection coefficients,
+the wall loss buffers, the stored signals (audio, glottal area, flow and fold
+displacement) and the spectrogram are single precision. The fold state, the
+noise filter memories, the viscous loss filter memories, the energy accumulators
+and the cycle times stay in double precision: they are a handful of numbers, or
+recursive filters whose rounding errors would grow, and the oscillator and cycle
+detection are the parts most sensitive to rounding.
+
+Results of compare_presets() for the default presets (simuvox_api.PRESETS; 1.5 s,
+seed 1, jitter 1; none: fused kernel, visc: viscous losses, both: viscous and
+wall losses):
+
+    preset  losses  max err  steady err  diff SNR   df0 (Hz)  djitter (%)  dOQ  dSB (Hz)  dSR (dB)  size
+    Male    none    1.2e-05  1.2e-05     103.9 dB   2.0e-09   2.1e-07      0    0         8.2e-06   0.50
+    Male    visc    1.9e-04  1.8e-05     101.6 dB   2.4e-09   2.9e-07      0    0         3.2e-06   0.50
+    Male    both    1.7e-04  2.0e-05      99.0 dB   2.0e-08   7.5e-08      0    0         6.7e-06   0.50
+    Female  none    8.9e-06  8.4e-06     107.9 dB   8.7e-09   1.0e-08      0    0         3.7e-07   0.50
+    Female  visc    5.4e-05  1.1e-05     105.5 dB   3.7e-10   2.6e-08      0    0         1.9e-07   0.50
+    Female  both    5.9e-05  1.8e-05     102.7 dB   1.3e-09   1.9e-08      0    0         6.1e-07   0.50
+
+Errors are relative to the peak of the float64 audio; "steady" is the analysis
+window between onset and offset. In the steady part the difference is of the
+order of the 16-bit output quantization step (3e-5 of full scale).
+
+Run this module to repeat the comparison.
+"""
+
+import numpy             as np
+import spectral_par      as sp
+import simuvox_api       as api
+
+
+LOSSES   = {"none": (False, False), "visc": (True, False), "both": (True, True)}
+
+MEASURES = ("f0", "jitter_percent", "open_quotient", "snr_db", "spectral_balance",
+            "spectral_ratio")
+
+
+def _nbytes(result):
+
+    return sum(value.nbytes for value in vars(result).values() if isinstance(value, np.ndarray))
+
+
+def compare(params, engine=None):
+
+    """ Differences between the double and single precision runs of params """
+
+    if engine is None:
+        engine = api.SimuVoxEngine(cache=False, warm_start=False)
+
+    double = engine.synthesize(api.VoiceParameters(**dict(vars(params), single_precision=False)))
+    single = engine.synthesize(api.VoiceParameters(**dict(vars(params), single_precision=True)))
+
+    if not (double.success and single.success):
+        raise RuntimeError(double.error_message or single.error_message)
+
+    error          = np.abs(double.audio - single.audio)
+    peak           = np.max(np.abs(double.audio))
+    (n0, n1)       = sp.get_analysis_window(engine._configure(params))
+
+    report = {"max_error":    float(np.max(error)/peak),
+              "steady_error": float(np.max(error[n0:n1])/peak),
+              "diff_snr_db":  float(10.*np.log10(np.sum(double.audio[n0:n1]**2)/
+                                                 np.sum(error[n0:n1]**2))),
+              "size_ratio":   _nbytes(single)/float(_nbytes(double))}
+
+    for name in MEASURES:
+        report[name] = abs(getattr(single, name) - getattr(double, name))
+
+    return report
+
+
+def compare_presets(seed=1, jitter=1.0):
+
+    """ compare() for the default male and female voices (api.PRESETS), without
+        losses, with viscous losses and with viscous and wall losses. Returns a
+        dictionary by (gender, losses) """
+
+    engine  = api.SimuVoxEngine(cache=False, warm_start=False)
+    reports = {}
+
+    for gender in ("Male", "Female"):
+        for losses, (visc, wall) in LOSSES.items():
+            params = api.VoiceParameters(gender=gender, seed=seed, jitter=jitter,
+                                         viscous_loss=visc, wall_vibration=wall,
+                                         **api.PRESETS[gender])
+            reports[(gender, losses)] = compare(params, engine)
+
+    return reports
+
+
+if __name__ == "__main__":
+
+    for (gender, losses), report in compare_presets().items():
+        print("%-7s %-5s max %.1e  steady %.1e  SNR %.1f dB  df0 %.1e  djitter %.1e  dOQ %.1e  "
+              "dSB %.1e  dSR %.1e  size %.2f" %
+              (gender, losses, report["max_error"], report["steady_error"], report["diff_snr_db"],
+               report["f0"], report["jitter_percent"], report["open_quotient"],
+               report["spectral_balance"], report["spectral_ratio"], report["size_ratio"]))
@@ -0,0 +1,170 @@
+# -*- coding: utf-8 -*-
+
+"""
+Stage profile of a synthesis run (config PROFILE_EVERY = k, VoiceParameters.
+profile_every, SynthesisResult.profile).
+
+Profiling runs the Python loop even where the fused kernel would be used: the
+kernel is one compiled call per block, whose stages cannot be timed apart, so
+with PROFILE_EVERY = k the run takes the time of the Python loop and the
+profile describes that loop. Every k-th sample runs with timing wrappers on the
+methods of its stages (fold vector field, noise and perturbation draws, tract
+junctions, viscous losses, lips, trachea, articulation); the other samples run
+the plain methods, so the loop pays one integer comparison per sample. Times
+are exclusive (a stage does not include the stages it calls); "other" is the
+rest of the timed samples (the loop itself and the stores of the signals). The
+wrappers slow the timed samples down by some 30%, so the loop stages are
+reported as shares of the measured time of the whole loop, in the proportions
+of the timed samples, and their call counts are scaled by k. The stages that
+run once per block (cycle measures, uncoupled tract filter) and the
+post-processing of the engine are timed at every call. With PROFILE_EVERY = 0
+no profiler is created and the kernel runs as usual.
+
+Example:
+    >>> result = engine.synthesize(VoiceParameters(viscous_loss=True, profile_every=64))
+    >>> print(profiler.format_report(result.profile))
+"""
+
+import time
+
+
+STAGES = ("folds", "noise", "perturbation", "tract", "viscous", "junctions", "wall", "lips",
+          "trachea", "articulation", "other", "filter", "measures", "spectral", "spectrogram")
+
+
+class PhaseProfiler(object):
+
+    def __init__(self, every):
+
+        """ Profiler timing one sample in every """
+
+        self.every     = int(every)
+        self.__targets = []
+        self.__time    = dict((stage, 0.) for stage in STAGES)
+        self.__calls   = dict((stage, 0) for stage in STAGES)
+        self.__stack   = []
+        self.__sampled = 0
+        self.__samples = 0
+        self.__start   = None
+        self.__loop_time = 0.
+
+    def attach(self, stage, obj, name):
+
+        """ Times the calls of obj.name in the sampled samples as stage """
+
+        if obj is not None and hasattr(obj, name):
+            self.__targets.append((stage, obj, name))
+
+    def _wrap(self, stage, method):
+
+        def timed(*args):
+            start = time.perf_counter()
+            self.__stack.append(0.)
+            try:
+                return method(*args)
+            finally:
+                elapsed = time.perf_counter() - start
+                inner   = self.__stack.pop()
+                self.__time[stage]  += elapsed - inner
+                self.__calls[stage] += 1
+                if self.__stack:
+                    self.__stack[-1] += elapsed
+
+        return timed
+
+    def begin_sample(self):
+
+        """ Installs the wrappers (as instance attributes) for the next sample """
+
+        for stage, obj, name in self.__targets:
+            setattr(obj, name, self._wrap(stage, getattr(obj, name)))
+
+        self.__stack = [0.]
+        self.__start = time.perf_counter()
+
+    def end_sample(self):
+
+        elapsed = time.perf_counter() - self.__start
+
+        for stage, obj, name in self.__targets:
+            delattr(obj, name)
+
+        self.__time["other"] += elapsed - self.__stack.pop()
+        self.__calls["other"] += 1
+        self.__sampled       += 1
+
+    def add_loop(self, count, elapsed):
+
+        """ Samples computed by a run of the Python loop, timed or not, and its time """
+
+        self.__samples   += count
+        self.__loop_time += elapsed
+
+    def add(self, stage, elapsed, calls=1):
+
+        """ Time of a stage measured at every call """
+
+        self.__time[stage]  += elapsed
+        self.__calls[stage] += calls
+
+    def get_report(self):
+
+        """ Dictionary with the sampling period, the samples computed and timed, and
+            the estimated time (s) and number of calls of each stage. The loop stages
+            share the measured time of the loop in the proportions of the timed
+            samples """
+
+        sample = ("folds", "noise", "perturbation", "tract", "viscous", "junctions", "wall",
+                  "lips", "trachea", "articulation", "other")
+        timed  = sum(self.__time[stage] for stage in sample)
+        scale  = self.__samples/float(self.__sampled) if self.__sampled > 0 else 0.
+        share  = self.__loop_time/timed if timed > 0. else 0.
+
+        stages = {}
+        for stage in STAGES:
+            if self.__calls[stage] > 0:
+                if stage in sample:
+                    stages[stage] = {"time":  self.__time[stage]*share,
+                                     "calls": int(round(self.__calls[stage]*scale))}
+                else:
+                    stages[stage] = {"time":  self.__time[stage],
+                                     "calls": self.__calls[stage]}
+
+        return {"every":   self.every,
+                "samples": self.__samples,
+                "sampled": self.__sampled,
+                "total":   sum(entry["time"] for entry in stages.values()),
+                "stages":  stages}
+
+
+def add_stage(report, stage, elapsed):
+
+    """ Adds a stage timed outside the synthesis (one call of elapsed s) to report """
+
+    entry = report["stages"].setdefault(stage, {"time": 0., "calls": 0})
+    entry["time"]   += elapsed
+    entry["calls"]  += 1
+    report["total"] += elapsed
+
+    return report
+
+
+def format_report(report):
+
+    """ Table of a profile report: stage, time, share of the total and time per call """
+
+    lines = ["%-13s %10s %7s %10s %10s" % ("stage", "time (s)", "share", "calls", "us/call")]
+    total = report["total"] if report["total"] > 0. else 1.
+
+    for stage in STAGES:
+        if stage in report["stages"]:
+            entry = report["stages"][stage]
+            lines.append("%-13s %10.4f %6.1f%% %10d %10.2f" %
+                         (stage, entry["time"], 100.*entry["time"]/total, entry["calls"],
+                          1e6*entry["time"]/max(entry["calls"], 1)))
+
+    lines.append("%-13s %10.4f    (%d of %d loop samples timed, every %d)" %
+                 ("total", report["total"], report["sampled"], report["samples"],
+                  report["every"]))
+
+    return "\n".join(lines)
@@ -0,0 +1,194 @@
+# -*- coding: utf-8 -*-
+
+"""
+Real-time block processing.
+
+RealTimeEngine produces fixed-size audio blocks on demand from a running
+Synthesis, as an audio device callback would request them. Each block has to be
+computed within its own duration (the block deadline): the engine times every
+block and counts the ones that miss the deadline as underruns, and reports the
+real-time factor (compute time over audio time; below 1 keeps up). Lung pressure,
+stiffness and disorder sizes may be changed between blocks.
+
+Example (headless):
+    >>> engine = RealTimeEngine(cfg.SimulationConfig(GENDER="Female"), block_size=512)
+    >>> engine.run(WaveFileSink("live.wav", engine.sample_rate))
+    >>> engine.get_report()["rtf"]
+
+With an audio library, pass engine.callback as the output stream callback.
+"""
+
+import time
+import wave
+import numpy             as np
+import config            as cfg
+import synthesis         as syn
+import decimation        as dc
+
+
+PARAMETER_KEYS = ("PL", "STIFFNESS", "WOW_SIZE", "TREMOR_SIZE", "FLUTTER_SIZE")
+
+
+class NullSink(object):
+
+    """ Discards the blocks; for timing runs """
+
+    def write(self, block):
+
+        pass
+
+    def close(self):
+
+        pass
+
+
+class WaveFileSink(object):
+
+    """ Writes the blocks to a 16-bit mono WAV file as they are produced """
+
+    def __init__(self, name, fs):
+
+        self.__wav_file = wave.open(name, "w")
+        self.__wav_file.setparams((1, 2, int(fs), 0, "NONE", "not compressed"))
+
+    def write(self, block):
+
+        self.__wav_file.writeframes((block*(2.**15 - 1.)).astype('<i2').tobytes())
+
+    def close(self):
+
+        self.__wav_file.close()
+
+
+class RealTimeEngine(object):
+
+    def __init__(self, config=None, block_size=512, gain=1.e-3, ramp_time=0.02):
+
+        """ block_size is in output frames (at FS/DECIMATE); gain converts the
+            radiated pressure to full scale, as blocks cannot be normalized """
+
+        self.__par           = cfg.get_config(config)
+
+        # Compile or load the synthesis kernel before the first timed block,
+        # leaving the random sequence of the actual voice untouched
+
+        rng_state            = np.random.get_state()
+        next(syn.Synthesis(self.__par).stream(64))
+        np.random.set_state(rng_state)
+
+        self.__synthesis_obj = syn.Synthesis(self.__par)
+        self.__block_size    = int(block_size)
+        self.__gain          = gain
+        self.__ramp_time     = ramp_time
+
+        self.sample_rate     = self.__par.FS/self.__par.DECIMATE
+        self.deadline        = self.__block_size/self.sample_rate
+
+        self.__stream        = self.__synthesis_obj.stream(self.__block_size*self.__par.DECIMATE)
+        self.__decimator     = dc.PolyphaseDecimator(self.__par.DECIMATE)
+        self.__finished      = False
+        self.__compute_time  = []
+        self.__underruns     = 0
+        self.__frames        = 0
+
+    def get_synthesis(self):
+
+        return self.__synthesis_obj
+
+    def set_parameters(self, **changes):
+
+        """ Applies PL, STIFFNESS and disorder size changes from the next block on """
+
+        unknown = set(changes) - set(PARAMETER_KEYS)
+        if unknown:
+            raise ValueError("parameters not adjustable in real time: %s" %
+                             ", ".join(sorted(unknown)))
+
+        self.__synthesis_obj.set_controls(changes.get("PL"), changes.get("STIFFNESS"),
+                                          self.__ramp_time)
+        self.__synthesis_obj.set_perturbation_sizes(changes.get("WOW_SIZE"),
+                                                    changes.get("TREMOR_SIZE"),
+                                                    changes.get("FLUTTER_SIZE"))
+
+    def pull(self):
+
+        """ Next block of block_size frames in [-1, 1], zero padded at the end of the
+            voice, or None once the voice is finished """
+
+        if self.__finished:
+            return None
+
+        t0 = time.perf_counter()
+
+        try:
+            (p_end, xg, ag, ug) = next(self.__stream)
+        except StopIteration:
+            self.__finished = True
+            return None
+
+        block    = np.zeros(self.__block_size)
+        if self.__par.DECIMATE > 1:
+            p_end = self.__decimator.process(p_end)
+        frames   = p_end*self.__gain
+        block[:frames.size] = np.clip(frames, -1., 1.)
+
+        elapsed  = time.perf_counter() - t0
+        self.__compute_time.append(elapsed)
+        self.__frames += frames.size
+        if elapsed > self.deadline:
+            self.__underruns += 1
+
+        return block
+
+    def callback(self, outdata, frames, time_info=None, status=None):
+
+        """ Pull-style audio callback: fills outdata (frames or (frames, 1) samples)
+            and returns False once the voice is finished """
+
+        if frames != self.__block_size:
+            raise ValueError("callback requested %d frames, block size is %d" %
+                             (frames, self.__block_size))
+
+        block = self.pull()
+        if block is None:
+            outdata[:] = 0.
+            return False
+
+        outdata[:] = block.reshape(np.shape(outdata))
+        return True
+
+    def run(self, sink=None):
+
+        """ Pulls all the blocks as fast as possible into sink (NullSink by default)
+            and returns the report """
+
+        if sink is None:
+            sink = NullSink()
+
+        try:
+            block = self.pull()
+            while block is not None:
+                sink.write(block)
+                block = self.pull()
+        finally:
+            sink.close()
+
+        return self.get_report()
+
+    def get_report(self):
+
+        compute_time = np.array(self.__compute_time)
+        audio_time   = self.__frames/self.sample_rate
+
+        if compute_time.size == 0:
+            compute_time = np.zeros(1)
+
+        return {"block_size":     self.__block_size,
+                "sample_rate":    self.sample_rate,
+                "deadline":       self.deadline,
+                "blocks":         len(self.__compute_time),
+                "underruns":      self.__underruns,
+                "compute_mean":   float(np.mean(compute_time)),
+                "compute_max":    float(np.max(compute_time)),
+                "compute_p99":    float(np.percentile(compute_time, 99.)),
+                "rtf":            float(np.sum(compute_time)/audio_time) if audio_time > 0. else 0.}
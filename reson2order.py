@@ -1,6 +1,7 @@
 
 
 import numpy             as np
+import scipy.signal      as sig
 
 
 # According to K. Steiglitz, "A Digital Signal Processing Primer", 
@@ -24,9 +25,11 @@ class TwoPoles(object) :
         cos_teta    = ((2. * R) / (1. + R * R)) * np.cos(psi)
         A_0         = (1. - R * R) * np.sqrt(1. - cos_teta * cos_teta)
 
-        self.a      = A_0
-        self.b      = 2. * R * cos_teta
-        self.c      = - R * R
+        # Python floats: get_sample runs once per sample on scalars
+
+        self.a      = float(A_0)
+        self.b      = float(2. * R * cos_teta)
+        self.c      = float(- R * R)
 
  
     def get_sample(self, x) :
@@ -37,7 +40,35 @@ class TwoPoles(object) :
         self.__y_m1 = y
         
         return y
-        
+
+
+    def get_block(self, x) :
+
+        # Same recursion as get_sample applied to a whole block, continuing from
+        # (and updating) the filter memories
+
+        num         = [self.a]
+        den         = [1., - self.b, - self.c]
+        zi          = sig.lfiltic(num, den, [self.__y_m1, self.__y_m2])
+        y, zf       = sig.lfilter(num, den, x, zi = zi)
+
+        if len(y) > 1 :
+            self.__y_m2, self.__y_m1 = y[-2], y[-1]
+        elif len(y) == 1 :
+            self.__y_m2, self.__y_m1 = self.__y_m1, y[-1]
+
+        return y
+
+
+    def get_state(self) :
+
+        return (self.__y_m1, self.__y_m2)
+
+
+    def set_state(self, state) :
+
+        (self.__y_m1, self.__y_m2) = state
+
         
     def plot_ftransfer(self):
         
@@ -78,10 +109,10 @@ class TwoPolesZeros(object):
         cos_teta     = ( (1. + R * R) / (2. * R) ) * np.cos(psi)
         A_0          = (1. - R * R)/ 2.
         
-        self.a       = A_0
-        self.b       = 2. * R * cos_teta
-        self.c       = - R * R
-        self.d       = - A_0
+        self.a       = float(A_0)
+        self.b       = float(2. * R * cos_teta)
+        self.c       = float(- R * R)
+        self.d       = float(- A_0)
 
 
     def get_sample(self, x):
@@ -97,6 +128,37 @@ class TwoPolesZeros(object):
         return y
 
 
+    def get_block(self, x):
+
+        # Same recursion as get_sample applied to a whole block, continuing from
+        # (and updating) the filter memories
+
+        num   = [self.a, 0., self.d]
+        den   = [1., - self.b, - self.c]
+        zi    = sig.lfiltic(num, den, [self.__y_m1, self.__y_m2],
+                            [self.__x_m1, self.__x_m2])
+        y, zf = sig.lfilter(num, den, x, zi = zi)
+
+        if len(y) > 1:
+            self.__y_m2, self.__y_m1 = y[-2], y[-1]
+            self.__x_m2, self.__x_m1 = x[-2], x[-1]
+        elif len(y) == 1:
+            self.__y_m2, self.__y_m1 = self.__y_m1, y[-1]
+            self.__x_m2, self.__x_m1 = self.__x_m1, x[-1]
+
+        return y
+
+
+    def get_state(self):
+
+        return (self.__y_m1, self.__y_m2, self.__x_m1, self.__x_m2)
+
+
+    def set_state(self, state):
+
+        (self.__y_m1, self.__y_m2, self.__x_m1, self.__x_m2) = state
+
+
     def plot_ftransfer(self):
         
         import matplotlib.pyplot as plt
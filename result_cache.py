@@ -0,0 +1,289 @@
+# -*- coding: utf-8 -*-
+
+"""
+Content-addressed cache of synthesis results.
+
+A result is identified by the SHA-256 of the fully resolved SimulationConfig
+(every parameter, including SEED and SAMPLING_MODE) and of the source code of
+the modules that produce it, so that editing the model invalidates old entries.
+Only reproducible runs are cached: runs with a seed, or without any noise source.
+
+ResultCache keeps a bounded in-memory LRU tier and, if given a directory, a disk
+tier of compressed .npz files evicted by total size and age.
+
+Example:
+    >>> cache  = ResultCache(directory="~/.cache/simuvox", max_disk_bytes=2**30)
+    >>> engine = SimuVoxEngine(cache=cache)
+"""
+
+import os
+import io
+import json
+import time
+import hashlib
+import threading
+import collections
+import dataclasses
+import numpy             as np
+
+
+# Modules whose source defines the synthesized signals and measures
+
+SOURCE_MODULES = ("config", "vt_data", "minjerk", "triangle", "extrema", "reson2order",
+                  "modulation_noise_2ndorder", "vocal_folds", "vocal_tract",
+                  "synthesis_kernel", "cycles", "synthesis", "spectral_par", "spec001",
+                  "simuvox_api")
+
+NOISE_KEYS = ("WOW_SIZE", "TREMOR_SIZE", "FLUTTER_SIZE", "ASPIRATION", "PULSATILE")
+
+_code_version = None
+
+
+def code_version():
+
+    """ Hash of the source files in SOURCE_MODULES, computed once per process """
+
+    global _code_version
+
+    if _code_version is None:
+        digest = hashlib.sha256()
+        folder = os.path.dirname(os.path.abspath(__file__))
+        for name in SOURCE_MODULES:
+            path = os.path.join(folder, name + ".py")
+            if os.path.exists(path):
+                with open(path, "rb") as source:
+                    digest.update(name.encode() + b"\0" + source.read() + b"\0")
+        _code_version = digest.hexdigest()
+
+    return _code_version
+
+
+def is_deterministic(config):
+
+    """ True when two runs with this configuration give the same result """
+
+    return config.SEED is not None or all(getattr(config, key) == 0. for key in NOISE_KEYS)
+
+
+def _canonical(value):
+
+    if isinstance(value, np.ndarray):
+        return {"dtype": value.dtype.str, "shape": list(value.shape),
+                "data": value.ravel().tolist()}
+    if isinstance(value, np.generic):
+        return value.item()
+    return value
+
+
+def cache_key(config, exclude=(), extra=b""):
+
+    """ Hex digest identifying the results of config with the current code. Parameters
+        in exclude are left out; extra bytes (e.g. signal samples) are hashed in """
+
+    params = dict((name, _canonical(value)) for name, value in config.as_dict().items()
+                  if name not in exclude)
+    text   = json.dumps({"params": params, "code": code_version()}, sort_keys=True)
+
+    return hashlib.sha256(text.encode() + extra).hexdigest()
+
+
+def _fields(result):
+
+    """ Public dataclass fields (derived artifacts are not stored) """
+
+    return [(item.name, getattr(result, item.name)) for item in dataclasses.fields(result)
+            if not item.name.startswith("_")]
+
+
+def result_nbytes(result):
+
+    return sum(value.nbytes for (_, value) in _fields(result) if isinstance(value, np.ndarray))
+
+
+def _frozen(result):
+
+    """ Shallow copy of result sharing read-only arrays with the cached entry """
+
+    for (_, value) in _fields(result):
+        if isinstance(value, np.ndarray):
+            value.flags.writeable = False
+
+    return dataclasses.replace(result)
+
+
+class ResultCache(object):
+
+    def __init__(self, max_memory_bytes=128*2**20, directory=None,
+                 max_disk_bytes=1024*2**20, max_age=7*24*3600.):
+
+        """ Memory tier bounded by max_memory_bytes; optional disk tier in directory,
+            bounded by max_disk_bytes, with entries older than max_age seconds dropped """
+
+        self.__max_memory_bytes = max_memory_bytes
+        self.__max_disk_bytes   = max_disk_bytes
+        self.__max_age          = max_age
+        self.__directory        = None
+        if directory is not None:
+            self.__directory    = os.path.expanduser(directory)
+            os.makedirs(self.__directory, exist_ok=True)
+
+        self.__entries          = collections.OrderedDict()
+        self.__memory_bytes     = 0
+        self.__lock             = threading.Lock()
+        self.__stats            = {"memory_hits": 0, "disk_hits": 0, "misses": 0}
+
+    def get(self, key, result_type):
+
+        """ Cached result for key, rebuilt as result_type when read from disk, or None """
+
+        with self.__lock:
+            if key in self.__entries:
+                self.__entries.move_to_end(key)
+                self.__stats["memory_hits"] += 1
+                return dataclasses.replace(self.__entries[key][0])
+
+        result = self._load(key, result_type)
+
+        with self.__lock:
+            if result is None:
+                self.__stats["misses"] += 1
+                return None
+            self.__stats["disk_hits"] += 1
+            self._remember(key, result)
+
+        return dataclasses.replace(result)
+
+    def put(self, key, result):
+
+        """ Stores result and returns a copy sharing its (now read-only) arrays """
+
+        result = _frozen(result)
+
+        with self.__lock:
+            self._remember(key, result)
+
+        if self.__directory is not None:
+            self._save(key, result)
+
+        return dataclasses.replace(result)
+
+    def clear(self):
+
+        with self.__lock:
+            self.__entries.clear()
+            self.__memory_bytes = 0
+
+        for path in self._disk_files():
+            try:
+                os.remove(path)
+            except OSError:
+                pass
+
+    def get_stats(self):
+
+        with self.__lock:
+            stats = dict(self.__stats)
+            stats["memory_entries"] = len(self.__entries)
+            stats["memory_bytes"]   = self.__memory_bytes
+
+        return stats
+
+    def _remember(self, key, result):
+
+        nbytes = result_nbytes(result)
+        if nbytes > self.__max_memory_bytes:
+            return
+
+        if key in self.__entries:
+            self.__memory_bytes -= self.__entries.pop(key)[1]
+
+        self.__entries[key]  = (result, nbytes)
+        self.__memory_bytes += nbytes
+
+        while self.__memory_bytes > self.__max_memory_bytes:
+            (_, (_, old_nbytes)) = self.__entries.popitem(last=False)
+            self.__memory_bytes -= old_nbytes
+
+    # Disk tier
+
+    def _path(self, key):
+
+        return os.path.join(self.__directory, key + ".npz")
+
+    def _disk_files(self):
+
+        if self.__directory is None:
+            return []
+
+        return [os.path.join(self.__directory, name) for name in os.listdir(self.__directory)
+                if name.endswith(".npz")]
+
+    def _save(self, key, result):
+
+        arrays = {}
+        meta   = {}
+        for name, value in _fields(result):
+            if isinstance(value, np.ndarray):
+                arrays[name] = value
+            else:
+                meta[name]   = value
+        arrays["__meta__"] = np.array(json.dumps(meta))
+
+        buffer = io.BytesIO()
+        np.savez_compressed(buffer, **arrays)
+
+        path   = self._path(key)
+        temp   = "%s.%d.%d.tmp" % (path, os.getpid(), threading.get_ident())
+        with open(temp, "wb") as handle:
+            handle.write(buffer.getvalue())
+        os.replace(temp, path)
+
+        self._evict()
+
+    def _load(self, key, result_type):
+
+        if self.__directory is None:
+            return None
+
+        path = self._path(key)
+        try:
+            if time.time() - os.path.getmtime(path) > self.__max_age:
+                os.remove(path)
+                return None
+            with np.load(path, allow_pickle=False) as data:
+                fields = json.loads(str(data["__meta__"]))
+                for name in data.files:
+                    if name != "__meta__":
+                        fields[name] = data[name]
+            os.utime(path)
+        except (OSError, ValueError, KeyError):
+            return None
+
+        return _frozen(result_type(**fields))
+
+    def _evict(self):
+
+        now   = time.time()
+        files = []
+        for path in self._disk_files():
+            try:
+                stat = os.stat(path)
+            except OSError:
+                continue
+            if now - stat.st_mtime > self.__max_age:
+                os.remove(path)
+            else:
+                files.append((stat.st_mtime, stat.st_size, path))
+
+        # Least recently used first (hits refresh the modification time)
+
+        files.sort()
+        total = sum(size for (_, size, _) in files)
+        for (_, size, path) in files:
+            if total <= self.__max_disk_bytes:
+                break
+            try:
+                os.remove(path)
+            except OSError:
+                pass
+            total -= size
@@ -11,14 +11,47 @@ Example:
     >>> params = VoiceParameters(gender="Female", jitter=2.5)
     >>> result = engine.synthesize(params)
     >>> print(f"F0: {result.f0:.1f} Hz, Jitter: {result.jitter_percent:.2f}%")
+
+Reproducible runs (with a seed or without noise) are cached by parameter
+hash; pass cache=rc.ResultCache(directory=...) to keep results across runs.
+Runs that share source, vocal tract and seed but differ in duration resume
+from the stored end of the voicing onset (see warm_start).
+
+Batch example (one worker process per core):
+    >>> with SimuVoxEngine() as engine:
+    ...     sweep = [VoiceParameters(stiffness=s) for s in range(60, 130, 5)]
+    ...     results = engine.synthesize_many(sweep)
+
+Parameter studies that only keep the scalar measures can use measure_many,
+which returns VoiceMeasures without audio, waveforms or spectrogram.
 """
 
 from dataclasses import dataclass, field
-from typing import Optional, Tuple
+from typing import Iterable, Iterator, List, Optional, Tuple, Union
+from concurrent.futures import ProcessPoolExecutor, as_completed
+import threading
+import time
+import base64
+import io
+import wave
 import numpy as np
 import config as cfg
 import synthesis as syn
 import spectral_par as sp
+import result_cache as rc
+import warm_start as wst
+import profiler as prf
+
+
+# Source parameters of the default male and female voices (GUI units). The gender
+# field alone only sets the vocal tract scale and ETA; pass these as well, e.g.
+# VoiceParameters(gender="Female", **PRESETS["Female"])
+PRESETS = {
+    "Male": {"mass": 0.2, "damping": 0.025, "stiffness": 90.0,
+             "glottal_length": 1.4, "glottal_depth": 0.3},
+    "Female": {"mass": 0.12, "damping": 0.015, "stiffness": 185.0,
+               "glottal_length": 1.0, "glottal_depth": 0.25},
+}
 
 
 @dataclass
@@ -48,6 +81,7 @@ class VoiceParameters:
     onset_time: float = 0.3          # s
     offset_time: float = 0.15        # s
     pitch_decrease: bool = False     # 10% pitch decrease if True
+    seed: Optional[int] = None       # Noise seed; same seed and parameters give the same audio
     
     # Gender (automatically adjusts multiple parameters)
     gender: str = "Male"             # "Male" or "Female"
@@ -65,6 +99,12 @@ class VoiceParameters:
     # Advanced options (usually left at defaults)
     viscous_loss: bool = False
     wall_vibration: bool = False
+    single_precision: bool = False   # float32 waves, signals and spectrogram (see precision.py)
+    tract_engine: str = "waveguide"  # "reflectance": precomputed tract responses, cheaper with losses
+    uncoupled: bool = False          # Fast source-filter approximation (see uncoupled.py)
+    fold_integrator: str = "euler"   # "semi-implicit": stable fold step at large ETA and stiffness
+    fold_substep: int = 1            # Fold step every fold_substep samples, euler only (see integrator.py)
+    profile_every: int = 0           # Stage timing of every profile_every-th sample (see profiler.py)
 
 
 @dataclass
@@ -100,6 +140,88 @@ class SynthesisResult:
     # Success flag
     success: bool = True
     error_message: str = ""
+    
+    # Stage timing of the run (profiler.PhaseProfiler.get_report) when profile_every > 0
+    profile: Optional[dict] = None
+    
+    # Derived artifacts, computed on first request (shared by cached copies)
+    _artifacts: dict = field(default_factory=dict, repr=False, compare=False)
+    
+    def derived(self, key: tuple, compute):
+        """
+        Artifact identified by key (artifact type plus its parameters),
+        computed by compute() on the first request and reused afterwards.
+        """
+        try:
+            return self._artifacts[key]
+        except KeyError:
+            value = compute()
+            self._artifacts[key] = value
+            return value
+    
+    def get_spectrogram(self, window_length: float = 0.05, overlap: float = 0.5,
+                        dynamic_r: float = 50.) -> Tuple[np.ndarray, float]:
+        """Spectrogram of the audio in dB and its maximum frequency."""
+        def compute():
+            from spec001 import get_ims
+            config = cfg.SimulationConfig(FS=float(self.sample_rate))
+            return get_ims(self.audio, window_length, overlap, dynamic_r, config=config)
+        return self.derived(("spectrogram", window_length, overlap, dynamic_r), compute)
+    
+    def get_wav_bytes(self) -> bytes:
+        """Peak-normalized 16-bit mono WAV file of the audio."""
+        def compute():
+            audio_bytes = io.BytesIO()
+            with wave.open(audio_bytes, 'wb') as wav_file:
+                wav_file.setnchannels(1)
+                wav_file.setsampwidth(2)  # 16-bit
+                wav_file.setframerate(self.sample_rate)
+                audio_normalized = self.audio / np.max(np.abs(self.audio))
+                audio_int16 = (audio_normalized * 32767).astype(np.int16)
+                wav_file.writeframes(audio_int16.tobytes())
+            return audio_bytes.getvalue()
+        return self.derived(("wav",), compute)
+    
+    def get_wav_base64(self) -> str:
+        """The WAV file of get_wav_bytes, base64-encoded."""
+        return self.derived(("wav_base64",),
+                            lambda: base64.b64encode(self.get_wav_bytes()).decode())
+    
+    def get_downsampled(self, name: str, factor: int) -> np.ndarray:
+        """Time series attribute name (e.g. 'glottal_flow') taken every factor samples."""
+        return self.derived(("downsampled", name, factor),
+                            lambda: getattr(self, name)[::factor])
+    
+    def get_measures(self) -> "VoiceMeasures":
+        """The scalar measures of this result."""
+        return VoiceMeasures(
+            f0=self.f0,
+            jitter_percent=self.jitter_percent,
+            open_quotient=self.open_quotient,
+            snr_db=self.snr_db,
+            spectral_balance=self.spectral_balance,
+            spectral_ratio=self.spectral_ratio,
+            success=self.success,
+            error_message=self.error_message
+        )
+
+
+@dataclass
+class VoiceMeasures:
+    """
+    Scalar measures of a voice, without signals (see SimuVoxEngine.measure).
+    """
+    
+    f0: float                        # Fundamental frequency (Hz)
+    jitter_percent: float            # Jitter (%)
+    open_quotient: float             # Open quotient (0-1)
+    snr_db: float                    # Signal-to-noise ratio (dB)
+    spectral_balance: float          # Spectral balance (Hz)
+    spectral_ratio: float            # Spectral ratio (dB)
+    
+    # Success flag
+    success: bool = True
+    error_message: str = ""
 
 
 class SimuVoxEngine:
@@ -107,12 +229,203 @@ class SimuVoxEngine:
     Pure synthesis engine - no GUI dependencies.
     
     Thread-safe and stateless - can be called from multiple threads
-    or in a web API context.
+    or in a web API context. Each call builds its own immutable
+    SimulationConfig, so concurrent runs never share parameters.
     """
     
-    def __init__(self):
-        """Initialize the synthesis engine."""
+    def __init__(self, max_workers: Optional[int] = None,
+                 cache: Union[bool, rc.ResultCache] = True,
+                 warm_start: Union[bool, wst.WarmStartStore] = True):
+        """
+        Initialize the synthesis engine.
+        
+        Args:
+            max_workers: Size of the process pool used by synthesize_many
+                (default: number of CPUs). The pool is created on first use
+                and its workers are reused until close() is called.
+            cache: Result cache for reproducible runs: True for an in-memory
+                ResultCache, a ResultCache (e.g. with a disk tier), or False.
+                Cached results share read-only arrays.
+            warm_start: Store of onset states for reproducible runs: True for
+                a new WarmStartStore, a WarmStartStore, or False.
+        """
+        if cache is True:
+            cache = rc.ResultCache()
+        self._cache = cache or None
+        if warm_start is True:
+            warm_start = wst.WarmStartStore()
+        self._warm_store = warm_start or None
         self._last_config = None
+        self._max_workers = max_workers
+        self._pool = None
+        self._pool_lock = threading.Lock()
+    
+    def __enter__(self):
+        return self
+    
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+    
+    def close(self):
+        """Shut down the worker pool, if one was started."""
+        with self._pool_lock:
+            if self._pool is not None:
+                self._pool.shutdown()
+                self._pool = None
+    
+    def _get_pool(self) -> ProcessPoolExecutor:
+        with self._pool_lock:
+            if self._pool is None:
+                self._pool = ProcessPoolExecutor(max_workers=self._max_workers,
+                                                 initializer=_init_worker)
+            return self._pool
+    
+    def synthesize_many(self, params_list: Iterable[VoiceParameters],
+                        chunksize: int = 1) -> List[SynthesisResult]:
+        """
+        Synthesize a batch of voices on the worker pool.
+        
+        Args:
+            params_list: Voice parameters, one entry per voice
+            chunksize: Number of voices sent to a worker at a time. Larger
+                chunks reduce inter-process traffic for short voices.
+            
+        Returns:
+            SynthesisResults in the order of params_list
+        """
+        params_list = list(params_list)
+        results = [self._cached(params)[1] for params in params_list]
+        missing = [i for i, result in enumerate(results) if result is None]
+        if missing:
+            pool = self._get_pool()
+            computed = pool.map(_synthesize_in_worker, [params_list[i] for i in missing],
+                                chunksize=chunksize)
+            for i, result in zip(missing, computed):
+                results[i] = self._store(params_list[i], result)
+        return results
+    
+    def synthesize_as_completed(self, params_list: Iterable[VoiceParameters],
+                                chunksize: int = 1) -> Iterator[Tuple[int, SynthesisResult]]:
+        """
+        Synthesize a batch of voices on the worker pool, yielding each
+        result as soon as its chunk is done.
+        
+        Args:
+            params_list: Voice parameters, one entry per voice
+            chunksize: Number of voices sent to a worker at a time
+            
+        Yields:
+            (index, SynthesisResult), where index is the position in params_list
+        """
+        params_list = list(params_list)
+        indexed = []
+        for index, params in enumerate(params_list):
+            result = self._cached(params)[1]
+            if result is None:
+                indexed.append((index, params))
+            else:
+                yield index, result
+        if not indexed:
+            return
+        pool = self._get_pool()
+        futures = [pool.submit(_synthesize_chunk_in_worker, indexed[i:i + chunksize])
+                   for i in range(0, len(indexed), chunksize)]
+        for future in as_completed(futures):
+            for index, result in future.result():
+                yield index, self._store(params_list[index], result)
+    
+    def measure(self, params: VoiceParameters) -> VoiceMeasures:
+        """
+        Measures-only synthesis: same measures as synthesize, without
+        allocating the full signals or computing the spectrogram.
+        
+        Args:
+            params: Voice synthesis parameters
+            
+        Returns:
+            VoiceMeasures (taken from the result cache when available)
+        """
+        cached = self._cached(params)[1]
+        if cached is not None:
+            return cached.get_measures()
+        
+        try:
+            config = self._configure(params)
+            synthesis_obj = syn.Synthesis(config, warm_store=self._warm_store)
+            measures = synthesis_obj.get_measures()
+            
+            return VoiceMeasures(
+                f0=float(measures["f0"]),
+                jitter_percent=float(measures["jitter"]),
+                open_quotient=float(measures["open_quotient"]),
+                snr_db=float(measures["noise"][2]),
+                spectral_balance=float(measures["spectral_balance"]),
+                spectral_ratio=float(measures["spectral_ratio"]),
+                success=True
+            )
+            
+        except Exception as e:
+            return VoiceMeasures(
+                f0=0.0,
+                jitter_percent=0.0,
+                open_quotient=0.0,
+                snr_db=0.0,
+                spectral_balance=0.0,
+                spectral_ratio=0.0,
+                success=False,
+                error_message=str(e)
+            )
+    
+    def measure_many(self, params_list: Iterable[VoiceParameters],
+                     chunksize: int = 1) -> List[VoiceMeasures]:
+        """
+        Measures-only version of synthesize_many. Only the scalar measures
+        are sent back from the workers.
+        
+        Args:
+            params_list: Voice parameters, one entry per voice
+            chunksize: Number of voices sent to a worker at a time
+            
+        Returns:
+            VoiceMeasures in the order of params_list
+        """
+        params_list = list(params_list)
+        results = [self._cached(params)[1] for params in params_list]
+        measures = [result.get_measures() if result is not None else None
+                    for result in results]
+        missing = [i for i, result in enumerate(measures) if result is None]
+        if missing:
+            pool = self._get_pool()
+            computed = pool.map(_measure_in_worker, [params_list[i] for i in missing],
+                                chunksize=chunksize)
+            for i, result in zip(missing, computed):
+                measures[i] = result
+        return measures
+    
+    def _cached(self, params: VoiceParameters):
+        """(cache key or None, cached result or None) for params."""
+        if self._cache is None:
+            return None, None
+        try:
+            config = self._configure(params)
+        except Exception:
+            return None, None
+        if not rc.is_deterministic(config) or config.PROFILE_EVERY > 0:
+            return None, None
+        key = rc.cache_key(config)
+        return key, self._cache.get(key, SynthesisResult)
+    
+    def _store(self, params: VoiceParameters, result: SynthesisResult) -> SynthesisResult:
+        if self._cache is None or not result.success:
+            return result
+        config = self._configure(params)
+        if not rc.is_deterministic(config) or config.PROFILE_EVERY > 0:
+            return result
+        return self._cache.put(rc.cache_key(config), result)
+    
+    def get_cache_stats(self) -> dict:
+        """Hit/miss counters and memory use of the result cache."""
+        return self._cache.get_stats() if self._cache is not None else {}
     
     def synthesize(self, params: VoiceParameters) -> SynthesisResult:
         """
@@ -140,12 +453,16 @@ class SimuVoxEngine:
             >>> audio_int16 = (result.audio * 32767).astype(np.int16)
             >>> wavfile.write('output.wav', result.sample_rate, audio_int16)
         """
+        key, cached = self._cached(params)
+        if cached is not None:
+            return cached
+        
         try:
-            # Configure global parameters
-            self._configure(params)
+            # Per-run configuration
+            config = self._configure(params)
             
             # Run synthesis
-            synthesis_obj = syn.Synthesis()
+            synthesis_obj = syn.Synthesis(config, warm_store=self._warm_store)
             p_end = synthesis_obj.get_voice()
             
             # Get acoustic measures
@@ -157,7 +474,11 @@ class SimuVoxEngine:
             xg, ag, ug = synthesis_obj.get_glottal()
             
             # Compute spectral measures
-            sb, sr = sp.compute_balance_and_ratio(ug)
+            profile = synthesis_obj.get_profile()
+            start = time.perf_counter()
+            sb, sr = sp.compute_balance_and_ratio(ug, config)
+            if profile is not None:
+                prf.add_stage(profile, "spectral", time.perf_counter() - start)
             
             # Generate spectrogram
             try:
@@ -165,26 +486,37 @@ class SimuVoxEngine:
             except ImportError:
                 from spec001 import get_ims
             
-            spec_data, f_max = get_ims(p_end)
+            start = time.perf_counter()
+            spec_data, f_max = get_ims(p_end, config=config)
+            spec_data = spec_data.astype(config.DTYPE, copy=False)
+            if profile is not None:
+                prf.add_stage(profile, "spectrogram", time.perf_counter() - start)
             
-            return SynthesisResult(
+            result = SynthesisResult(
                 audio=p_end,
-                sample_rate=int(cfg.Param.FS),
+                sample_rate=int(config.FS),
                 f0=float(f0),
                 jitter_percent=float(jitter),
                 open_quotient=float(oq),
                 snr_db=float(noise[2]),
                 spectral_balance=float(sb),
                 spectral_ratio=float(sr),
-                time=synthesis_obj.t,
+                time=synthesis_obj.t.astype(config.DTYPE, copy=False),
                 glottal_area=ag,
                 glottal_flow=ug,
                 vocal_fold_displacement=xg,
                 spectrogram=spec_data,
                 spectrogram_freq_max=float(f_max),
-                success=True
+                success=True,
+                profile=profile
             )
             
+            result._artifacts[("spectrogram", 0.05, 0.5, 50.)] = (spec_data, f_max)
+            
+            if key is not None:
+                result = self._cache.put(key, result)
+            return result
+            
         except Exception as e:
             # Return error result instead of raising
             return SynthesisResult(
@@ -206,50 +538,91 @@ class SimuVoxEngine:
                 error_message=str(e)
             )
     
-    def _configure(self, params: VoiceParameters):
+    def _configure(self, params: VoiceParameters) -> cfg.SimulationConfig:
         """
-        Update cfg.Param from VoiceParameters.
+        Build the per-run configuration from VoiceParameters.
         
-        Converts GUI units to internal units.
+        Converts GUI units to internal units. cfg.Param is only read as the
+        source of defaults and is never modified.
         """
-        # Source parameters (convert units)
-        cfg.Param.PL = params.lung_pressure * 10.0  # Pa → dyn/cm²
-        cfg.Param.MASS = params.mass
-        cfg.Param.DAMPING = params.damping * 1000.0  # N·s/m → dyn·s/cm
-        cfg.Param.STIFFNESS = params.stiffness * 1000.0  # N/m → dyn/cm
-        cfg.Param.TAU = params.tau / 1000.0  # ms → s
-        cfg.Param.ABDUCTION = params.abduction
-        cfg.Param.GLOTTAL_LENGTH = params.glottal_length
-        cfg.Param.GLOTTAL_DEPTH = params.glottal_depth
-        
-        # Simulation parameters
-        cfg.Param.TIME_TOTAL = params.duration
-        cfg.Param.TIME_ONSET = params.onset_time
-        cfg.Param.TIME_OFFSET = params.offset_time
-        cfg.Param.PROSODY = params.pitch_decrease
-        
         # Gender-specific parameters
-        cfg.Param.GENDER = params.gender
         if params.gender == "Male":
-            cfg.Param.GENDER_SCALE = 1.0
-            cfg.Param.ETA = 500.0
+            gender_scale = 1.0
+            eta = 500.0
         else:
-            cfg.Param.GENDER_SCALE = 0.8
-            cfg.Param.ETA = 1500.0
-        
-        # Disorder parameters
-        cfg.Param.Q = params.asymmetry
-        cfg.Param.WOW_SIZE = params.wow
-        cfg.Param.TREMOR_SIZE = params.tremor
-        cfg.Param.FLUTTER_SIZE = params.jitter
-        cfg.Param.ASPIRATION = params.aspiration
+            gender_scale = 0.8
+            eta = 1500.0
         
-        # Vocal tract
-        cfg.Param.VT_FILE = params.vocal_tract
-        
-        # Advanced options
-        cfg.Param.VISC_LOSS = params.viscous_loss
-        cfg.Param.WALL_VIBR = params.wall_vibration
+        return cfg.SimulationConfig(
+            # Source parameters (convert units)
+            PL=params.lung_pressure * 10.0,  # Pa → dyn/cm²
+            MASS=params.mass,
+            DAMPING=params.damping * 1000.0,  # N·s/m → dyn·s/cm
+            STIFFNESS=params.stiffness * 1000.0,  # N/m → dyn/cm
+            TAU=params.tau / 1000.0,  # ms → s
+            ABDUCTION=params.abduction,
+            GLOTTAL_LENGTH=params.glottal_length,
+            GLOTTAL_DEPTH=params.glottal_depth,
+            
+            # Simulation parameters
+            TIME_TOTAL=params.duration,
+            TIME_ONSET=params.onset_time,
+            TIME_OFFSET=params.offset_time,
+            PROSODY=params.pitch_decrease,
+            SEED=params.seed,
+            
+            GENDER=params.gender,
+            GENDER_SCALE=gender_scale,
+            ETA=eta,
+            
+            # Disorder parameters
+            Q=params.asymmetry,
+            WOW_SIZE=params.wow,
+            TREMOR_SIZE=params.tremor,
+            FLUTTER_SIZE=params.jitter,
+            ASPIRATION=params.aspiration,
+            
+            # Vocal tract
+            VT_FILE=params.vocal_tract,
+            
+            # Advanced options
+            VISC_LOSS=params.viscous_loss,
+            WALL_VIBR=params.wall_vibration,
+            DTYPE="float32" if params.single_precision else "float64",
+            TRACT_ENGINE=params.tract_engine,
+            UNCOUPLED=params.uncoupled,
+            FOLD_INTEGRATOR=params.fold_integrator,
+            FOLD_SUBSTEP=params.fold_substep,
+            PROFILE_EVERY=params.profile_every,
+        )
+
+
+# Process pool workers: the engine (and with it the synthesis modules) is
+# created once per worker process and reused for every voice it receives.
+# A short warm-up voice loads the compiled kernel before the first real job.
+
+_worker_engine = None
+
+
+def _init_worker():
+    global _worker_engine
+    # Forked workers inherit the parent's global random state; unseeded runs
+    # must not repeat the same noise in every worker
+    np.random.seed()
+    _worker_engine = SimuVoxEngine(cache=False)
+    _worker_engine.synthesize(VoiceParameters(duration=0.6))
+
+
+def _synthesize_in_worker(params: VoiceParameters) -> SynthesisResult:
+    return _worker_engine.synthesize(params)
+
+
+def _synthesize_chunk_in_worker(chunk):
+    return [(index, _worker_engine.synthesize(params)) for index, params in chunk]
+
+
+def _measure_in_worker(params: VoiceParameters) -> VoiceMeasures:
+    return _worker_engine.measure(params)
 
 
 def synthesize_voice_simple(
@@ -1,6 +1,7 @@
 import wave
 import random
 import config as cfg
+import decimation
 
 
 def normalize(x):
@@ -38,7 +39,7 @@ def quantize_and_code(x):
     
 #    signal = "".join(wave.struct.pack('h',item) for item in x)
     
-    signal = x.astype('int16').tostring()
+    signal = x.astype('int16').tobytes()
 
     return signal
 
@@ -71,12 +72,12 @@ def save_wavfile(x,fs,name):
 
     wav_file.close()
 
-def get_sound_file(x):
+def get_sound_file(x, config=None):
     
-    if cfg.Param.DECIMATE > 1 :
-        #from scipy.signal import decimate
-        #x = decimate(x, cfg.Param.DECIMATE)
-        x = x[::2]
+    par = cfg.get_config(config)
+
+    if par.DECIMATE > 1 :
+        x = decimation.decimate(x, par.DECIMATE)
     """ normalizes, dithers, quantizes and outputs in that order """
     
     x = normalize(x)
@@ -2,8 +2,9 @@ import numpy as np
 import config as cfg
 
     
-def compute_spectral_balance(amplitude_spectrum):
+def compute_spectral_balance(amplitude_spectrum, config=None):
 
+    par                 = cfg.get_config(config)
     n_spectrum          = len(amplitude_spectrum)
     energy              = np.cumsum(amplitude_spectrum**2)
     spectral_balance    = 0.
@@ -11,16 +12,17 @@ def compute_spectral_balance(amplitude_spectrum):
     for i in range(0,n_spectrum):
 
         if energy[i] > energy[-1]/2. :
-            spectral_balance = i * cfg.Param.FS / n_spectrum /2.
+            spectral_balance = i * par.FS / n_spectrum /2.
             break
 
     return spectral_balance
 
         
-def compute_spectral_ratio(amplitude_spectrum):
+def compute_spectral_ratio(amplitude_spectrum, config=None):
     
+    par                 = cfg.get_config(config)
     n_spectrum          = len(amplitude_spectrum)
-    sf_d2               = 0.5*cfg.Param.FS
+    sf_d2               = 0.5*par.FS
 
     n_crit              = int (n_spectrum * 1000. / sf_d2)
 
@@ -32,12 +34,29 @@ def compute_spectral_ratio(amplitude_spectrum):
     return ratio
 
     
-def compute_balance_and_ratio (any_signal) :
+def get_analysis_window(config=None) :
 
-    n_onset          = int(cfg.Param.TIME_ONSET*cfg.Param.FS)
-    n_offset         = int((cfg.Param.TIME_TOTAL - cfg.Param.TIME_OFFSET - cfg.Param.TIME_FINAL)*cfg.Param.FS)
-    
-    signal = any_signal[n_onset:n_offset]
+    """ First and last (excluded) samples of the steady part of the voice """
+
+    par              = cfg.get_config(config)
+    n_onset          = int(par.TIME_ONSET*par.FS)
+    n_offset         = int((par.TIME_TOTAL - par.TIME_OFFSET - par.TIME_FINAL)*par.FS)
+
+    return n_onset, n_offset
+
+
+def compute_balance_and_ratio (any_signal, config=None) :
+
+    (n_onset, n_offset) = get_analysis_window(config)
+
+    return compute_window_balance_and_ratio(any_signal[n_onset:n_offset], config)
+
+
+def compute_window_balance_and_ratio (signal, config=None) :
+
+    """ Spectral balance and ratio of a signal already cut to the analysis window """
+
+    par      = cfg.get_config(config)
     l_signal = len(signal)
     window = np.hamming(l_signal)
     
@@ -47,7 +66,7 @@ def compute_balance_and_ratio (any_signal) :
     spectrum=spectrum[range(l_signal//2)]
     amplitude_spectrum = 20*np.log10(np.abs(spectrum))          
 
-    sb = compute_spectral_balance(amplitude_spectrum)
-    sr = compute_spectral_ratio(amplitude_spectrum)
+    sb = compute_spectral_balance(amplitude_spectrum, par)
+    sr = compute_spectral_ratio(amplitude_spectrum, par)
     
     return sb, sr    
\ No newline at end of file
@@ -6,172 +6,747 @@ Created on Fri Oct 05 13:05:12 2012
 @author: Jorge C. Lucero
 """
 
+import time
+import warnings
 import vt_data           as vtd
 import config            as cfg
 import vocal_tract       as vtm
 import vocal_folds       as vfm
+import synthesis_kernel  as skn
+import modulation_noise_2ndorder as m2
+import warm_start        as wst
+import cycles            as cyc
+import profiler          as prf
+import spectral_par      as sp
 import numpy             as np
 import minjerk
 
 
+# Parameters that may differ between the continuations of a fork
+
+FORK_KEYS = ("PL", "STIFFNESS", "ABDUCTION", "MASS", "DAMPING", "ETA", "TAU", "KT", "Q",
+             "GLOTTAL_LENGTH", "GLOTTAL_DEPTH", "WOW_SIZE", "TREMOR_SIZE", "FLUTTER_SIZE",
+             "ASPIRATION", "PULSATILE", "FENDA")
+
+
+def compute_jitter_percent(series):
+
+    n               = series.size
+    jitter          = 0.
+    average_length  = 0.
+
+    running_average = (series[:-2] + series[1:-1] + series[2:])/3.    
+    jitter          = np.sum(abs(running_average - series[1:-1]))
+    average_length  = np.sum(series[1:-1])/float(n - 2)
+
+    # Alternative jitter measure as in Voxmetria 
+            
+    # perturb = abs(series[1:-1] - running_average)/abs(running_average) 
+    # jitter2 = (100./float(n-2))*np.sum(perturb)
+
+    if average_length == 0.:
+        return(-1,0)
+    else:
+        average_f0          = 1./average_length
+        jitter              = (100./float(n - 2))*jitter/average_length
+
+    return (jitter, average_f0)
+
+
 class Synthesis(object):
     
-    def __init__(self) :
+    def __init__(self, config=None, warm_store=None) :
         
-        self.__nsamples     = int(cfg.Param.TIME_TOTAL*cfg.Param.FS) 
-        self.t              = np.linspace(0,cfg.Param.TIME_TOTAL, self.__nsamples)
+        self.__par          = cfg.get_config(config)
+        self.__nsamples     = int(self.__par.TIME_TOTAL*self.__par.FS) 
+        self.t              = np.linspace(0,self.__par.TIME_TOTAL, self.__nsamples)
 
-        vocaltract_obj      = vtd.MakeVT()
+        vocaltract_obj      = vtd.MakeVT(self.__par)
+        self.__area         = vocaltract_obj.AREA
+        self.__trachea      = vocaltract_obj.TRACHEA
 
-        self.__voice_timing = np.array([0., cfg.Param.TIME_ONSET, cfg.Param.TIME_TOTAL - 
-                                       (cfg.Param.TIME_OFFSET + cfg.Param.TIME_FINAL), 
-                                        cfg.Param.TIME_TOTAL - cfg.Param.TIME_FINAL, 
-                                        cfg.Param.TIME_TOTAL]) 
+        # Time-varying area function: the tract starts at the first frame and
+        # follows the trajectory sample by sample
 
-        pl_pattern        = np.array([0., cfg.Param.PL, cfg.Param.PL, 0., 0.])
+        self.__trajectory   = None
+        if self.__par.AREA_TRAJECTORY is not None:
+            trajectory = np.asarray(self.__par.AREA_TRAJECTORY, dtype=float)
+            if trajectory.ndim != 2 or trajectory.shape[0] != self.__area.size:
+                raise ValueError("AREA_TRAJECTORY must have one row per vocal tract tube (%d)"
+                                 % self.__area.size)
+            if self.__par.TRACT_ENGINE != "waveguide" or self.__par.UNCOUPLED == True:
+                raise ValueError("a time-varying area function needs the coupled waveguide tract")
+            self.__trajectory = trajectory
+            self.__moving     = np.any(np.diff(trajectory, axis=1) != 0., axis=0)
+            self.__held       = None
+            self.__area       = trajectory[:, 0].copy()
+
+        self.__voice_timing = np.array([0., self.__par.TIME_ONSET, self.__par.TIME_TOTAL - 
+                                       (self.__par.TIME_OFFSET + self.__par.TIME_FINAL), 
+                                        self.__par.TIME_TOTAL - self.__par.TIME_FINAL, 
+                                        self.__par.TIME_TOTAL]) 
+
+        pl_pattern        = np.array([0., self.__par.PL, self.__par.PL, 0., 0.])
  
-        abduction_pattern = np.array([cfg.Param.ABDUCTION, cfg.Param.ABDUCTION, cfg.Param.ABDUCTION, 
-                                      cfg.Param.ABDUCTION, cfg.Param.ABDUCTION])                
+        abduction_pattern = np.array([self.__par.ABDUCTION, self.__par.ABDUCTION, self.__par.ABDUCTION, 
+                                      self.__par.ABDUCTION, self.__par.ABDUCTION])                
         
-        stiffness_pattern = np.array([cfg.Param.STIFFNESS, cfg.Param.STIFFNESS, cfg.Param.STIFFNESS, 
-                                      cfg.Param.STIFFNESS, cfg.Param.STIFFNESS])
+        stiffness_pattern = np.array([self.__par.STIFFNESS, self.__par.STIFFNESS, self.__par.STIFFNESS, 
+                                      self.__par.STIFFNESS, self.__par.STIFFNESS])
         
               
-        if cfg.Param.PROSODY == True:
+        if self.__par.PROSODY == True:
             stiffness_pattern = np.array([1., 1., 0.9, 0.9, 0.9])*stiffness_pattern
         
         self.pl             = minjerk.make_signal(self.__voice_timing, pl_pattern, self.t)       
         self.abduction      = minjerk.make_signal(self.__voice_timing, abduction_pattern, self.t)
         self.stiffness      = minjerk.make_signal(self.__voice_timing, stiffness_pattern, self.t)
 
+        self.__pl_target        = self.__par.PL
+        self.__abduction_target = self.__par.ABDUCTION
+        self.__stiffness_target = self.__par.STIFFNESS
+
  
         
-        self.__downstr_obj  = vtm.DownstreamVT(vocaltract_obj.AREA)
-        self.__upstr_obj    = vtm.UpstreamVT(vocaltract_obj.TRACHEA, self.pl[0])
+        if self.__par.TRACT_ENGINE == "reflectance":
+            self.__downstr_obj = vtm.ReflectanceVT(self.__area, self.__par)
+        else:
+            self.__downstr_obj = vtm.DownstreamVT(self.__area, self.__par)
+        if self.__trajectory is not None:
+            self.__downstr_obj.set_area(self.__area, np.arange(self.__area.size))
+        self.__upstr_obj    = vtm.UpstreamVT(vocaltract_obj.TRACHEA, self.pl[0], self.__par)
+
+        # Uncoupled runs: the tract filters the glottal flow after each block. Where
+        # the kernel runs the coupled tract the approximation saves nothing
+
+        if self.__par.UNCOUPLED == True:
+            self.__filter_obj = vtm.UncoupledTract(self.__area, self.__par)
+            if (self.__par.FUSED_KERNEL == True and
+                    skn.is_supported(self.__par.replace(UNCOUPLED=False))):
+                warnings.warn("UNCOUPLED is no faster than the coupled run of this "
+                              "configuration, which the fused kernel covers (uncoupled.py)",
+                              stacklevel=2)
+        else:
+            self.__filter_obj = None
 
-        self.__md_obj       = vfm.VFmodel(vocaltract_obj.AREA[0], vocaltract_obj.TRACHEA[0])
+        self.__generators   = m2.make_generators(self.__par.SEED)
+        if self.__par.SCALAR_FOLDS != True and (self.__par.FOLD_INTEGRATOR != "euler" or
+                                                self.__par.FOLD_SUBSTEP != 1):
+            raise ValueError("FOLD_INTEGRATOR and FOLD_SUBSTEP need SCALAR_FOLDS")
+
+        folds_class         = vfm.ScalarVFmodel if self.__par.SCALAR_FOLDS == True else vfm.VFmodel
+        self.__md_obj       = folds_class(self.__area[0], vocaltract_obj.TRACHEA[0],
+                                          self.__par, self.__generators)
  
-        self.__ag           = np.zeros(self.__nsamples)
-        self.__wg           = np.zeros((self.__nsamples,4))
-        self.__ug           = np.zeros(self.__nsamples)
+        self.__ag           = np.zeros(0)
+        self.__wg           = np.zeros((0,4))
+        self.__ug           = np.zeros(0)
         
         self.__oq           = 0.
         self.__f0           = 0.
         self.__jitter       = 0.
         self.__jitter2      = 0.        
         self.__noise        = (1000., 1000., 1000.)        
+
+        # Running state of the simulation: the next sample to compute and the
+        # cycle and open quotient detector, which runs on each computed block
+ 
+        self.__nsample      = 1
+        self.__cycles       = int((self.__voice_timing[2] - self.__voice_timing[1])*self.__par.MAXFREQ)       
+        self.__cycle_obj    = cyc.CycleDetector(2.*self.__voice_timing[1]*self.__par.FS,
+                                                self.__voice_timing[2]*self.__par.FS,
+                                                self.__cycles, self.__par.DELTA_T)
+        self.__p_vt_glot_back = 0.
+        self.__p_tr_sub_back  = 0.
+        self.__rng_state      = None
+
+        # Optional warm start: the state at the end of the onset is taken from,
+        # or saved to, a warm_start.WarmStartStore
+
+        self.__warm_store     = warm_store
+        self.__nonset         = int(self.__voice_timing[1]*self.__par.FS)
+
+        # A stage profile needs the Python loop, whose stages it times
+
+        if (self.__par.FUSED_KERNEL == True and skn.is_supported(self.__par) and
+                self.__par.PROFILE_EVERY == 0):
+            self.__kernel_obj = skn.FusedVoice(self.__area, self.__trachea, self.pl,
+                                               self.abduction, self.stiffness, 
+                                               self.__par, self.__generators)
+        else:
+            self.__kernel_obj = None
+            if self.__par.PRECOMPUTED_NOISE == True:
+                self.__md_obj.precompute_noise(self.__nsamples - 1)
+
+        # Optional stage profile (profiler.py): the methods of each stage are timed
+        # in every PROFILE_EVERY-th sample of the Python loop
+
+        self.__profiler     = None
+        if self.__par.PROFILE_EVERY > 0:
+            self.__profiler = prf.PhaseProfiler(self.__par.PROFILE_EVERY)
+            self._attach_profiler(self.__profiler)
                        
         
     
     def get_voice(self):
+
+        p_end          = np.zeros(self.__nsamples, self.__par.DTYPE)
+        self.__ag      = np.zeros(self.__nsamples, self.__par.DTYPE)
+        self.__wg      = np.zeros((self.__nsamples,4), self.__par.DTYPE)
+        self.__ug      = np.zeros(self.__nsamples, self.__par.DTYPE)
+
+        self._run(self.__nsamples, p_end, self.__wg, self.__ag, self.__ug)
+
+        self._finish()
+    
+        return p_end
+
+
+    def stream(self, block_size=4096):
+        """
+        Generator version of get_voice. Yields tuples (p_end, xg, ag, ug) of
+        consecutive blocks of at most block_size samples, so that playback or
+        transmission can start after the first block. Only two block buffers
+        are kept, whatever the duration of the voice. The jitter, open quotient
+        and noise measures are available from the getters once the generator is
+        exhausted; get_glottal does not hold the signals in this mode.
+        """
+
+        block_size     = int(block_size)
+        if block_size < 1:
+            raise ValueError("block_size must be a positive integer")
+
+        p_end          = np.zeros(block_size, self.__par.DTYPE)
+        ag             = np.zeros(block_size, self.__par.DTYPE)
+        wg             = np.zeros((block_size,4), self.__par.DTYPE)
+        ug             = np.zeros(block_size, self.__par.DTYPE)
+
+        start          = 0 if self.__nsample == 1 else self.__nsample
+
+        for n0 in range(start, self.__nsamples, block_size):
+            n1 = min(n0 + block_size, self.__nsamples)
+            if n0 == 0:
+                p_end[0] = 0.
+                ag[0]    = 0.
+                wg[0,:]  = 0.
+                ug[0]    = 0.
+            self._run(n1, p_end, wg, ag, ug, offset=n0)
+            m = n1 - n0
+            yield (p_end[:m].copy(), wg[:m,[0,2]], ag[:m].copy(), ug[:m].copy())
+
+        self._finish()
+
+
+    def advance(self, n1):
+        """
+        Simulates up to (excluding) sample n1 and returns (p_end, xg, ag, ug) for
+        the samples computed, starting at sample 0 on a new object. The measures
+        are finalized when the end of the voice is reached.
+        """
+
+        n1             = min(int(n1), self.__nsamples)
+        start          = 0 if self.__nsample == 1 else self.__nsample
+        m              = max(n1 - start, 0)
+
+        p_end          = np.zeros(m, self.__par.DTYPE)
+        ag             = np.zeros(m, self.__par.DTYPE)
+        wg             = np.zeros((m,4), self.__par.DTYPE)
+        ug             = np.zeros(m, self.__par.DTYPE)
+
+        self._run(n1, p_end, wg, ag, ug, offset=start)
+
+        if n1 == self.__nsamples:
+            self._finish()
+
+        return (p_end, wg[:,[0,2]], ag, ug)
+
+
+    def get_measures(self, block_size=4096):
+        """
+        Lean version of get_voice for callers that only need the measures. The
+        signals go through fixed block buffers and only the glottal flow in the
+        spectral analysis window is kept; get_glottal does not hold the signals
+        in this mode. Returns a dictionary with f0, jitter, open_quotient, noise
+        (flow-to-noise ratios), spectral_balance and spectral_ratio, equal to
+        those of a get_voice run.
+        """
+
+        block_size     = int(block_size)
+        if block_size < 1:
+            raise ValueError("block_size must be a positive integer")
+
+        (n_onset, n_offset) = sp.get_analysis_window(self.__par)
+        n_offset       = min(n_offset, self.__nsamples)
+        n_onset        = min(n_onset, n_offset)
+        ug_window      = np.zeros(n_offset - n_onset, self.__par.DTYPE)
+
+        start          = 0 if self.__nsample == 1 else self.__nsample
+        n1             = start + block_size
+        if start == 0 and self.__warm_store is not None:
+            n1         = max(n1, self.__nonset + 1)     # first block covers the onset
+        size           = n1 - start
+
+        p_end          = np.zeros(size, self.__par.DTYPE)
+        ag             = np.zeros(size, self.__par.DTYPE)
+        wg             = np.zeros((size,4), self.__par.DTYPE)
+        ug             = np.zeros(size, self.__par.DTYPE)
+
+        n0             = start
+        while n0 < self.__nsamples:
+            n1 = min(n0 + size, self.__nsamples)
+            self._run(n1, p_end, wg, ag, ug, offset=n0)
+            (i0, i1) = (max(n0, n_onset), min(n1, n_offset))
+            if i1 > i0:
+                ug_window[i0 - n_onset:i1 - n_onset] = ug[i0 - n0:i1 - n0]
+            n0 = n1
+
+        self._finish()
+
+        (sb, sr)       = sp.compute_window_balance_and_ratio(ug_window, self.__par)
+
+        return {"f0":               self.__f0,
+                "jitter":           self.__jitter,
+                "open_quotient":    self.__oq,
+                "noise":            self.__noise,
+                "spectral_balance": sb,
+                "spectral_ratio":   sr}
+
+
+    def snapshot(self):
+        """
+        Returns the complete dynamic state at the current sample as a picklable
+        dictionary: fold, tract, trachea and lip states (or the fused kernel
+        arrays), noise filter memories, control trajectories, cycle detector
+        and the random state of the noise streams.
+        """
+
+        state = {"nsample":  self.__nsample,
+                 "rng":      (m2.get_generator_state(self.__generators)
+                              if self.__rng_state is None else self.__rng_state),
+                 "controls": (self.pl.copy(), self.abduction.copy(), self.stiffness.copy()),
+                 "targets":  (self.__pl_target, self.__abduction_target,
+                              self.__stiffness_target),
+                 "cycles":   self.__cycle_obj.get_state()}
+
+        if self.__kernel_obj is not None:
+            state["kernel"]   = self.__kernel_obj.get_state()
+        else:
+            state["folds"]    = self.__md_obj.get_state()
+            state["downstr"]  = self.__downstr_obj.get_state()
+            state["upstr"]    = self.__upstr_obj.get_state()
+            state["backward"] = (self.__p_vt_glot_back, self.__p_tr_sub_back)
+
+        if self.__filter_obj is not None:
+            state["filter"]   = self.__filter_obj.get_state()
+
+        return state
+
+
+    def restore(self, state):
+        """
+        Continues the simulation from a snapshot taken on an object with the
+        same vocal tract, duration and simulation options. Signals returned by a
+        later get_voice are zero before the restored sample.
+        """
+
+        if ("kernel" in state) != (self.__kernel_obj is not None):
+            raise ValueError("snapshot taken with a different synthesis backend")
+        if state["controls"][0].size != self.__nsamples:
+            raise ValueError("snapshot taken on a voice of different duration")
+
+        self.pl[:]        = state["controls"][0]
+        self.abduction[:] = state["controls"][1]
+        self.stiffness[:] = state["controls"][2]
+
+        (self.__pl_target, self.__abduction_target,
+         self.__stiffness_target) = state["targets"]
+
+        self._set_dynamic_state(state)
+
+
+    def _set_dynamic_state(self, state):
+
+        if self.__kernel_obj is not None:
+            self.__kernel_obj.set_state(state["kernel"])
+        else:
+            self.__md_obj.set_state(state["folds"])
+            self.__downstr_obj.set_state(state["downstr"])
+            self.__upstr_obj.set_state(state["upstr"])
+
+            (self.__p_vt_glot_back, self.__p_tr_sub_back) = state["backward"]
+
+        self.__cycle_obj.set_state(state["cycles"])
+
+        if self.__filter_obj is not None:
+            self.__filter_obj.set_state(state["filter"])
+
+        # The random state is set when the simulation resumes, so that several
+        # restored objects can be run one after the other
+
+        self.__nsample   = state["nsample"]
+        self.__rng_state = state["rng"]
+
+
+    def _onset_key(self):
+
+        # Precomputed noise streams are drawn for the whole duration at once,
+        # so their state at the end of the onset depends on it
+
+        if self.__warm_store is None or self.__nonset < 2 or self.__nonset >= self.__nsamples:
+            return None
+        if self.__kernel_obj is None and self.__par.PRECOMPUTED_NOISE == True:
+            return None
+
+        # The frames of a time-varying area function are spread over TIME_TOTAL,
+        # which is not part of the key
+
+        if self.__trajectory is not None:
+            return None
+
+        return wst.onset_key(self.__par, (self.pl, self.abduction, self.stiffness),
+                             self.__nonset)
+
+
+    def _warm_start(self, key, p_end, wg, ag, ug):
+        """
+        Simulates the onset and saves its final state and signals in the warm
+        store, or resumes from the state saved by an earlier run with the same key.
+        """
+
+        n     = self.__nonset
+        entry = self.__warm_store.get(key)
+
+        if entry is None:
+            self._simulate(n, p_end, wg, ag, ug, 0)
+            state = self.snapshot()
+            del state["controls"], state["targets"]
+            self.__warm_store.put(key, state, (p_end[:n], wg[:n], ag[:n], ug[:n]))
+            return
+
+        (state, (p_onset, wg_onset, ag_onset, ug_onset)) = entry
+
+        self._set_dynamic_state(state)
+
+        # Runs without a seed draw from the global random state, which is left alone
+        # (they are noise free, otherwise they would not have a key)
+
+        if m2.is_global(self.__generators):
+            self.__rng_state = None
+
+        p_end[:n] = p_onset
+        wg[:n]    = wg_onset
+        ag[:n]    = ag_onset
+        ug[:n]    = ug_onset
+
+
+    def fork(self, variants, ramp_time=0.02):
+        """
+        Returns one new Synthesis per dictionary of parameter changes in variants
+        (keys in FORK_KEYS), each continuing from the current state. Lung
+        pressure, abduction and stiffness move to their new targets with a
+        min-jerk transition of ramp_time seconds; the other source parameters
+        apply from the fork sample on. All continuations start from the same
+        random state.
+        """
+
+        state    = self.snapshot()
+        children = []
+
+        for changes in variants:
+
+            unknown = set(changes) - set(FORK_KEYS)
+            if unknown:
+                raise ValueError("parameters not allowed in a fork: %s" %
+                                 ", ".join(sorted(unknown)))
+
+            child = Synthesis(self.__par.replace(**changes))
+            child.restore(state)
+            child.set_controls(changes.get("PL"), changes.get("STIFFNESS"), ramp_time,
+                               changes.get("ABDUCTION"))
+            children.append(child)
+
+        return children
+
+
+    def set_controls(self, pl=None, stiffness=None, ramp_time=0.02, abduction=None):
+        """
+        Changes the lung pressure, stiffness and/or abduction targets of the part of the
+        voice not yet simulated. The remaining trajectories are rescaled to the
+        new targets, reached with a min-jerk transition of ramp_time seconds
+        starting at the next sample. Intended to be called between stream blocks.
+        """
+
+        n     = self.__nsample
+        nramp = max(1, int(ramp_time*self.__par.FS))
+        u     = np.minimum(np.arange(1, self.__nsamples - n + 1)/float(nramp), 1.)
+        blend = u*u*u*(10. - 15.*u + 6.*u*u)
+
+        if pl is not None:
+            self._retarget(self.pl, n, blend, self.__pl_target, pl,
+                           np.array([0., pl, pl, 0., 0.]))
+            self.__pl_target = pl
+
+        if stiffness is not None:
+            pattern = np.array([stiffness]*5)
+            if self.__par.PROSODY == True:
+                pattern = np.array([1., 1., 0.9, 0.9, 0.9])*pattern
+            self._retarget(self.stiffness, n, blend, self.__stiffness_target, stiffness,
+                           pattern)
+            self.__stiffness_target = stiffness
+
+        if abduction is not None:
+            self._retarget(self.abduction, n, blend, self.__abduction_target, abduction,
+                           np.array([abduction]*5))
+            self.__abduction_target = abduction
+
+
+    def _retarget(self, signal, n, blend, old_target, new_target, pattern):
+
+        # The arrays are updated in place, since the fused kernel holds them
+
+        if old_target != 0.:
+            new_signal = signal[n:]*(new_target/old_target)
+        else:
+            new_signal = minjerk.make_signal(self.__voice_timing, pattern, self.t)[n:]
+
+        signal[n:] += (new_signal - signal[n:])*blend
+
+
+    def set_perturbation_sizes(self, wow=None, tremor=None, flutter=None):
+        """
+        Changes the wow, tremor and flutter sizes (disorder sizes) from the next
+        sample on.
+        """
+
+        if self.__kernel_obj is not None:
+            self.__kernel_obj.set_perturbation_sizes(wow, tremor, flutter, self.__par)
+        else:
+            self.__md_obj.set_perturbation_sizes(wow, tremor, flutter)
+
+
+    def get_nsamples(self):
+
+        return self.__nsamples
+
+
+    def _run(self, n1, p_end, wg, ag, ug, offset=0):
+        """
+        Advances the simulation from the current sample up to (excluding) n1,
+        writing sample n of the outputs at index n - offset. The onset comes from
+        the warm store when the first call covers it.
+        """
+
+        if self.__nsample == 1 and offset == 0 and n1 > self.__nonset:
+            key = self._onset_key()
+            if key is not None:
+                self._warm_start(key, p_end, wg, ag, ug)
+
+        self._simulate(n1, p_end, wg, ag, ug, offset)
+
+
+    def _simulate(self, n1, p_end, wg, ag, ug, offset):
+
+        n0 = self.__nsample
+        if n1 <= n0:
+            return
+
+        if self.__rng_state is not None:
+            m2.set_generator_state(self.__generators, self.__rng_state)
+            self.__rng_state = None
+
+        profiler = self.__profiler
+
+        if self.__kernel_obj is not None:
+            self.__kernel_obj.run(n0, n1, p_end, wg, ag, ug, offset)
+            self.__nsample = n1
+            self._process_block(n0, n1, p_end, wg, ag, ug, offset)
+            return
  
-        p_vt_glot_back = 0.
-        p_tr_sub_back  = 0.
-        p_end          = np.zeros(self.__nsamples)
-        
-        nstart         = 2.*self.__voice_timing[1]*cfg.Param.FS
-        nend           =    self.__voice_timing[2]*cfg.Param.FS
- 
-        cycles         = int((self.__voice_timing[2] - self.__voice_timing[1])*cfg.Param.MAXFREQ)       
-        oqcycle        = np.zeros(cycles)                              
-        iop1           = 0
-        iop2           = 0
-        noq            = 0        
-        tcycle         = np.zeros(cycles)                      
-        icycle         = 0
+        p_vt_glot_back = self.__p_vt_glot_back
+        p_tr_sub_back  = self.__p_tr_sub_back
+
+        # Next sample timed by the profiler (n1: none)
+
+        if profiler is not None:
+            profiled = n0 + (-n0) % profiler.every
+            start    = time.perf_counter()
+        else:
+            profiled = n1
         
-        for n in range(1,self.__nsamples):
+        for n in range(n0,n1):
+
+            m = n - offset
+
+            if n == profiled:
+                profiler.begin_sample()
+
+            if self.__trajectory is not None:
+                self._articulate(n)
 
             # Excitation
 
             (p_tr_sub_for, p_vt_glot_for,
-             self.__wg[n,:], self.__ag[n], 
-             self.__ug[n])                  = self.__md_obj.vectorfield(
+             wg[m,:], ag[m], ug[m])         = self.__md_obj.vectorfield(
                                                   p_tr_sub_back, p_vt_glot_back,
                                                   self.abduction[n], self.stiffness[n])
 
-
-            if n > nstart and n < nend:
-            
-                # Open quotient
-
-                if noq < cycles:                    
-                    if self.__ag[n] <= .0001 and self.__ag[n-1] > .0001:
-                        if iop1 > 0 and iop2 > 0:
-                            oqcycle[noq]   += (n - iop2)/float(n - iop1)
-                            noq            +=1
-                        iop1 = n
-                    if self.__ag[n] > .0001 and self.__ag[n-1] <= .0001:
-                        iop2 = n  
-                else:
-                    print("Warning: increase MAXFREQ")
-        
-                # Cycle boundaries
-                                
-                if icycle < cycles:
-                    if self.__wg[n, 0] >= 0. and self.__wg[n-1, 0] < 0.:
-                        tcycle[icycle] = (self.__wg[n,0]*(n - 1) - self.__wg[n-1,0]*n)*\
-                                          cfg.Param.DELTA_T/(self.__wg[n,0] - self.__wg[n-1,0])
-                        icycle += 1
     
-                else:
-                    print("Warning: increase MAXFREQ")
-    
-            # Propagation in the vocal tract
+            # Propagation in the vocal tract (filtered after the loop if uncoupled)
         
-            if cfg.Param.HALF_SAMPLING == "Yes":
-                (p_end[n], p_vt_glot_back) = self.__downstr_obj.propagation_half(p_vt_glot_for)
+            if self.__filter_obj is not None:
+                p_vt_glot_back             = self.__filter_obj.glottal_load(p_vt_glot_for,
+                                                                            p_vt_glot_back)
+            elif self.__par.HALF_SAMPLING == "Yes":
+                (p_end[m], p_vt_glot_back) = self.__downstr_obj.propagation_half(p_vt_glot_for)
             else:
-                (p_end[n], p_vt_glot_back) = self.__downstr_obj.propagation(p_vt_glot_for)
+                (p_end[m], p_vt_glot_back) = self.__downstr_obj.propagation(p_vt_glot_for)
                 
             p_tr_sub_back              = self.__upstr_obj.propagation(p_tr_sub_for, self.pl[n])
-     
+
+            if n == profiled:
+                profiler.end_sample()
+                profiled += profiler.every
+
+        if profiler is not None:
+            profiler.add_loop(n1 - n0, time.perf_counter() - start)
+
+        self.__p_vt_glot_back = p_vt_glot_back
+        self.__p_tr_sub_back  = p_tr_sub_back
+        self.__nsample        = n1
+
+        self._process_block(n0, n1, p_end, wg, ag, ug, offset)
+
+
+    def _process_block(self, n0, n1, p_end, wg, ag, ug, offset):
+
+        # Uncoupled tract filter and cycle measures of the block just computed
+
+        profiler = self.__profiler
+        start    = time.perf_counter()
+
+        self._filter_tract(n0, n1, p_end, ug, offset)
+        if profiler is not None and self.__filter_obj is not None:
+            profiler.add("filter", time.perf_counter() - start)
+            start = time.perf_counter()
+
+        self.__cycle_obj.process(n0, wg[n0 - offset:n1 - offset, 0], ag[n0 - offset:n1 - offset])
+        if profiler is not None:
+            profiler.add("measures", time.perf_counter() - start)
+
+
+    def _attach_profiler(self, profiler):
+
+        # Methods timed in the sampled samples, by stage. The junctions of a tract
+        # with wall vibration include the wall losses
+
+        profiler.attach("folds", self.__md_obj, "vectorfield")
+        profiler.attach("noise", self.__md_obj, "_next_noise")
+        profiler.attach("perturbation", self.__md_obj, "_perturb")
+        profiler.attach("trachea", self.__upstr_obj, "propagation")
+        if self.__trajectory is not None:
+            profiler.attach("articulation", self, "_articulate")
+
+        if self.__filter_obj is not None:
+            return
+
+        for name in ("propagation", "propagation_half"):
+            profiler.attach("tract", self.__downstr_obj, name)
+
+        if isinstance(self.__downstr_obj, vtm.DownstreamVT):
+            (vlosses, junct, liptr) = self.__downstr_obj.get_parts()
+            for name in ("addloss", "addloss_half"):
+                profiler.attach("viscous", vlosses, name)
+            stage = "wall" if self.__par.WALL_VIBR == True else "junctions"
+            for name in ("propagation_full", "propagation_half", "scatter", "scatter_half"):
+                profiler.attach(stage, junct, name)
+            profiler.attach("lips", liptr, "propagation")
+
+
+    def _articulate(self, n):
+
+        # Area function at sample n, linearly interpolated between the frames (tubes
+        # equal in both frames keep their exact area). The tract recomputes the
+        # coefficients of the tubes whose area changed
+
+        trajectory = self.__trajectory
+        nframes    = trajectory.shape[1]
+
+        if nframes == 1:
+            k      = 0
+            area   = trajectory[:, 0]
+        else:
+            x      = n*(nframes - 1)/float(max(self.__nsamples - 1, 1))
+            k      = min(int(x), nframes - 2)
+            if not self.__moving[k]:
+                area = trajectory[:, k]
+            else:
+                w    = x - k
+                area = trajectory[:, k] + w*(trajectory[:, k + 1] - trajectory[:, k])
+
+        # Between two equal frames the area is set once
+
+        if nframes == 1 or not self.__moving[k]:
+            if self.__held == k:
+                return
+            self.__held = k
+        else:
+            self.__held = None
+
+        self.__downstr_obj.set_area(area)
+        self.__md_obj.set_supraglottal_area(area[0])
+
+
+    def _filter_tract(self, n0, n1, p_end, ug, offset):
+
+        # Lips output of an uncoupled run, from sample 0 on (whose flow is zero)
+
+        if self.__filter_obj is None:
+            return
+
+        if n0 == 1 and offset == 0:
+            n0 = 0
+        p_end[n0 - offset:n1 - offset] = self.__filter_obj.process(ug[n0 - offset:n1 - offset])
+
+
+    def _finish(self):
+
+        if self.__kernel_obj is not None:
+            noise                   = self.__kernel_obj.get_flow_to_noise_ratio()
+        else:
+            noise                   = self.__md_obj.get_flow_to_noise_ratio()
+
+        limit_warning = self.__cycle_obj.get_limit_warning()
+        if limit_warning is not None:
+            warnings.warn(limit_warning, stacklevel=3)
+
         # Compute jitter and open quotient
     
-        if icycle > 1:
-            per             = tcycle[1:icycle] - tcycle[:icycle-1]    
+        self._compute_measures(*self.__cycle_obj.get_cycles())
+            
+        # Compute noise 
+    
+        self.__noise    = noise
+
+
+    def _compute_measures(self, tcycle, oqcycle):
+
+        if tcycle.size > 1:
+            per             = tcycle[1:] - tcycle[:-1]    
             (self.__jitter,
              self.__f0)     = self._compute_jitter_percent(per)
         else:
             self.__jitter  = 0.
             self.__f0      = 0.
 
-        if noq > 0:        
-            self.__oq       = np.median(oqcycle[:noq])
+        if oqcycle.size > 0:        
+            self.__oq       = np.median(oqcycle)
         else:
             self.__oq = 1.
-            
-        # Compute noise 
-    
-        self.__noise    = self.__md_obj.get_flow_to_noise_ratio()
-
-        # Vocal fold position
-    
-        return p_end
         
         
     def _compute_jitter_percent(self, series):
 
-        n               = series.size
-        jitter          = 0.
-        average_length  = 0.
-    
-        running_average = (series[:-2] + series[1:-1] + series[2:])/3.    
-        jitter          = np.sum(abs(running_average - series[1:-1]))
-        average_length  = np.sum(series[1:-1])/float(n - 2)
-
-        # Alternative jitter measure as in Voxmetria 
-                
-        # perturb = abs(series[1:-1] - running_average)/abs(running_average) 
-        # jitter2 = (100./float(n-2))*np.sum(perturb)
-
-        if average_length == 0.:
-            return(-1,0)
-        else:
-            average_f0          = 1./average_length
-            jitter              = (100./float(n - 2))*jitter/average_length
-    
-        return (jitter, average_f0)    
+        return compute_jitter_percent(series)
         
         
     def get_glottal(self):
@@ -191,4 +766,26 @@ class Synthesis(object):
         
     def get_noise(self):
 
-        return self.__noise        
\ No newline at end of file
+        return self.__noise        
+
+
+    def get_profile(self):
+
+        """ Stage profile of the samples computed so far (PhaseProfiler.get_report), or
+            None when PROFILE_EVERY is 0 """
+
+        if self.__profiler is None:
+            return None
+
+        return self.__profiler.get_report()
+
+
+    def get_fold_report(self):
+
+        """ Step report of the fold integrator (ScalarVFmodel.get_step_report), or
+            None when the folds ran in the fused kernel or in VFmodel """
+
+        if self.__kernel_obj is not None or not isinstance(self.__md_obj, vfm.ScalarVFmodel):
+            return None
+
+        return self.__md_obj.get_step_report()
\ No newline at end of file
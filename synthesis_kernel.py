@@ -0,0 +1,675 @@
+# -*- coding: utf-8 -*-
+
+"""
+Fused single-loop synthesis kernel.
+
+The complete dynamic state of the simulation (vocal fold vector, vocal tract and
+trachea waves, lip filter memories and noise filter states) is kept in flat
+preallocated arrays, and the coupled source/tract loop of Synthesis.get_voice runs
+inside one function. The arithmetic mirrors VFmodel, DownstreamVT.propagation_half
+(or DownstreamVT.propagation at full rate, WallVibration.scatter_half with wall
+losses) and UpstreamVT.propagation operation by operation, so that both paths produce the same signals for the same random draws.
+
+The loop is compiled with numba when it is installed. Otherwise it runs as plain
+Python with scalar locals for the source and vectorized junction updates.
+"""
+
+import math
+import numpy       as np
+import config      as cfg
+import reson2order as r2
+import vocal_tract as vtm
+import modulation_noise_2ndorder as m2
+import triangle
+
+try:
+    import numba
+except ImportError:
+    numba = None
+
+BACKEND = "numba" if numba is not None else "python"
+
+
+# Indices into the coefficient vector
+
+C_MEDIAL_AREA  = 0
+C_GL           = 1
+C_FENDA        = 2
+C_Q            = 3
+C_EPS          = 4
+C_TRI_A1       = 5
+C_TRI_A3       = 6
+C_TRI_A5       = 7
+C_ASUB         = 8
+C_ASUPRA       = 9
+C_AEFECT       = 10
+C_C1           = 11
+C_C2           = 12
+C_C3           = 13
+C_C4           = 14
+C_C5           = 15
+C_C6           = 16
+C_NOISE_SCALE  = 17
+C_PULSATILE    = 18
+C_ASPIRATION   = 19
+C_REYNOLDS     = 20
+C_APHONIA      = 21
+C_DAMPING      = 22
+C_MASS         = 23
+C_ETA          = 24
+C_DELTA_T      = 25
+C_DW           = 26
+C_WOW          = 27
+C_TREMOR       = 28
+C_FLUTTER      = 29
+C_R_LUNGS      = 30
+C_LIPS_FR      = 31
+C_R_LIPS       = 32
+C_NR0          = 33
+C_NR1          = 34
+C_DR0          = 35
+C_DR1          = 36
+C_NT0          = 37
+C_NT1          = 38
+C_DT0          = 39
+C_DT1          = 40
+C_HALF         = 41
+C_WALL         = 42
+C_UNCOUPLED    = 43
+C_LOAD_POLE    = 44
+C_LOAD_GAIN    = 45
+NCOEF          = 46
+
+# Indices into the float state vector
+
+S_GLOT_BACK    = 0        # Backward pressure wave at the glottal end of the vocal tract
+S_SUB_BACK     = 1        # Backward pressure wave at the subglottal end of the trachea
+S_LUNGS_BACK   = 2        # Backward pressure wave entering the trachea from the lungs
+S_LIPS_F       = 3        # Lip filter memories
+S_LIPS_B       = 4
+S_LIPS_P       = 5
+S_E_CLEAN      = 6        # Energy accumulators for the flow-to-noise ratios
+S_E_NOISE      = 7
+S_E_ASPIRATION = 8
+S_E_PULSATILE  = 9
+NSTATE         = 10
+
+# Rows of the noise filter arrays (coefficients a, b, c, d and memories y1, y2, x1, x2)
+
+R_NOISE        = 0
+R_WOW          = 1
+R_TREMOR       = 2
+R_FLUTTER      = 3
+
+NDRAWS         = 7        # Normal draws per sample: aspiration, then wow/tremor/flutter twice
+
+
+def is_supported(config=None):
+
+    """ The kernel covers the half-sampling and full-rate waveguide tracts without
+        viscous losses, wall vibration with half sampling, and every uncoupled run
+        (whose tract is filtered outside the kernel), all with a static area
+        function and the Euler-Maruyama fold step at every sample """
+
+    par = cfg.get_config(config)
+
+    if (par.AREA_TRAJECTORY is not None or par.FOLD_INTEGRATOR != "euler" or
+            par.FOLD_SUBSTEP != 1):
+        return False
+
+    return par.UNCOUPLED == True or (par.TRACT_ENGINE == "waveguide" and
+                                     par.VISC_LOSS == False and
+                                     (par.WALL_VIBR == False or par.HALF_SAMPLING == "Yes"))
+
+
+def _tract_half_step_loop(pf, pb, refl, i, scratch):
+
+    j = i
+    while j < pf.size - 1:
+        p_in_forward     = pf[j]
+        p_in_backward_p1 = pb[j+1]
+        theta            = refl[j]*(p_in_forward - p_in_backward_p1)
+        pf[j+1]          = p_in_forward + theta
+        pb[j]            = p_in_backward_p1 + theta
+        j               += 2
+
+
+def _tract_half_step_vec(pf, pb, refl, i, scratch):
+
+    theta = scratch[:refl[i::2].size]
+    np.subtract(pf[i:-1:2], pb[i+1::2], out=theta)
+    np.multiply(refl[i::2], theta, out=theta)
+    np.add(pf[i:-1:2], theta, out=pf[i+1::2])
+    np.add(pb[i+1::2], theta, out=pb[i:-1:2])
+
+
+def _wall_half_step_loop(pf, pb, ploss, wcoef, i, scratch):
+
+    # Same operations as WallVibration.scatter_half
+
+    j = i
+    while j < pf.size - 1:
+        p_in_forward     = pf[j]
+        p_in_backward_p1 = pb[j+1]
+        p_in_loss        = ploss[j]
+        pf[j+1]  = (wcoef[0, j]*p_in_forward + wcoef[1, j]*p_in_backward_p1
+                    + wcoef[2, j]*p_in_loss)
+        pb[j]    = (wcoef[3, j]*p_in_forward + wcoef[4, j]*p_in_backward_p1
+                    + wcoef[2, j]*p_in_loss)
+        ploss[j] = (wcoef[0, j]*p_in_forward + wcoef[4, j]*p_in_backward_p1
+                    + wcoef[5, j]*p_in_loss)
+        j       += 2
+
+
+def _wall_half_step_vec(pf, pb, ploss, wcoef, i, scratch):
+
+    p_in_forward     = pf[i:-1:2].copy()
+    p_in_backward_p1 = pb[i+1::2].copy()
+    p_in_loss        = ploss[i:-1:2].copy()
+    c                = wcoef[:, i::2]
+    pf[i+1::2]    = c[0]*p_in_forward + c[1]*p_in_backward_p1 + c[2]*p_in_loss
+    pb[i:-1:2]    = c[3]*p_in_forward + c[4]*p_in_backward_p1 + c[2]*p_in_loss
+    ploss[i:-1:2] = c[0]*p_in_forward + c[4]*p_in_backward_p1 + c[5]*p_in_loss
+
+
+def _trachea_step_loop(pf, pb, refl, p_sub_for, p_lungs_back, scratch):
+
+    m      = pf.size
+    b_next = pb[m-1]
+    for j in range(m - 2, -1, -1):
+        p_in_forward     = pf[j]
+        p_in_backward_p1 = b_next
+        b_next           = pb[j]
+        theta            = refl[j]*(p_in_forward - p_in_backward_p1)
+        pf[j+1]          = p_in_forward + theta
+        pb[j]            = p_in_backward_p1 + theta
+    pf[0]   = p_sub_for
+    pb[m-1] = p_lungs_back
+
+
+def _trachea_step_vec(pf, pb, refl, p_sub_for, p_lungs_back, scratch):
+
+    theta = scratch[:refl.size]
+    np.subtract(pf[:-1], pb[1:], out=theta)
+    np.multiply(refl, theta, out=theta)
+    np.add(pf[:-1], theta, out=pf[1:])
+    np.add(pb[1:], theta, out=pb[:-1])
+    pf[0]  = p_sub_for
+    pb[-1] = p_lungs_back
+
+
+def _voice_loop(n0, n1, offset, pl, abduction, stiffness, normals, coef, rcoef, rstate,
+                w, pf, pb, refl, ploss, wcoef, tpf, tpb, trefl, scratch, state,
+                p_end, wg, ag_out, ug_out):
+
+    medial_area = coef[C_MEDIAL_AREA]
+    gl          = coef[C_GL]
+    fenda       = coef[C_FENDA]
+    q           = coef[C_Q]
+    eps         = coef[C_EPS]
+    a_1         = coef[C_TRI_A1]
+    a_3         = coef[C_TRI_A3]
+    a_5         = coef[C_TRI_A5]
+    asub        = coef[C_ASUB]
+    asupra      = coef[C_ASUPRA]
+    aefect      = coef[C_AEFECT]
+    c1          = coef[C_C1]
+    c2          = coef[C_C2]
+    c3          = coef[C_C3]
+    c4          = coef[C_C4]
+    c5          = coef[C_C5]
+    c6          = coef[C_C6]
+    noise_scale = coef[C_NOISE_SCALE]
+    pulsatile   = coef[C_PULSATILE]
+    c_asp       = coef[C_ASPIRATION]
+    reynolds    = coef[C_REYNOLDS] > 0.
+    aphonia     = coef[C_APHONIA] > 0.
+    damping     = coef[C_DAMPING]
+    mass        = coef[C_MASS]
+    eta         = coef[C_ETA]
+    delta_t     = coef[C_DELTA_T]
+    dW          = coef[C_DW]
+    c_wow       = coef[C_WOW]
+    c_tremor    = coef[C_TREMOR]
+    c_flutter   = coef[C_FLUTTER]
+    r_lungs     = coef[C_R_LUNGS]
+    lips_fr     = coef[C_LIPS_FR] > 0.
+    r_lips      = coef[C_R_LIPS]
+    nr0         = coef[C_NR0]
+    nr1         = coef[C_NR1]
+    dr0         = coef[C_DR0]
+    dr1         = coef[C_DR1]
+    nt0         = coef[C_NT0]
+    nt1         = coef[C_NT1]
+    dt0         = coef[C_DT0]
+    dt1         = coef[C_DT1]
+    half        = coef[C_HALF] > 0.
+    wall        = coef[C_WALL] > 0.
+    uncoupled   = coef[C_UNCOUPLED] > 0.
+    load_pole   = coef[C_LOAD_POLE]
+    load_gain   = coef[C_LOAD_GAIN]
+
+    na, nb, nc           = rcoef[R_NOISE, 0], rcoef[R_NOISE, 1], rcoef[R_NOISE, 2]
+    wa, wb, wc           = rcoef[R_WOW, 0], rcoef[R_WOW, 1], rcoef[R_WOW, 2]
+    ta, tb, tc           = rcoef[R_TREMOR, 0], rcoef[R_TREMOR, 1], rcoef[R_TREMOR, 2]
+    fa, fb, fc, fd       = (rcoef[R_FLUTTER, 0], rcoef[R_FLUTTER, 1], rcoef[R_FLUTTER, 2],
+                            rcoef[R_FLUTTER, 3])
+
+    n_y1, n_y2           = rstate[R_NOISE, 0], rstate[R_NOISE, 1]
+    w_y1, w_y2           = rstate[R_WOW, 0], rstate[R_WOW, 1]
+    t_y1, t_y2           = rstate[R_TREMOR, 0], rstate[R_TREMOR, 1]
+    f_y1, f_y2           = rstate[R_FLUTTER, 0], rstate[R_FLUTTER, 1]
+    f_x1, f_x2           = rstate[R_FLUTTER, 2], rstate[R_FLUTTER, 3]
+
+    w0, w1, w2, w3       = w[0], w[1], w[2], w[3]
+
+    p_vt_glot_back       = state[S_GLOT_BACK]
+    p_tr_sub_back        = state[S_SUB_BACK]
+    p_lungs_back         = state[S_LUNGS_BACK]
+    lips_f               = state[S_LIPS_F]
+    lips_b               = state[S_LIPS_B]
+    lips_p               = state[S_LIPS_P]
+    energ_clean          = state[S_E_CLEAN]
+    energ_noise          = state[S_E_NOISE]
+    energ_aspiration     = state[S_E_ASPIRATION]
+    energ_pulsatile      = state[S_E_PULSATILE]
+
+    ntubes               = pf.size
+    lips_step            = 1 - ntubes % 2
+
+    for n in range(n0, n1):
+
+        k      = n - n0
+        sep    = abduction[n]
+        kstiff = stiffness[n]/medial_area
+        ps_in  = p_tr_sub_back
+        pi_in  = p_vt_glot_back
+
+        # Glottal area: regularized max(ag, 0) and cosine to triangle mapping
+
+        x     = (1. - fenda)*gl*(sep + w0 + w2)
+        abs_x = abs(x)
+        ag    = 0.5*(x + abs_x)
+        if abs_x < eps:
+            abs_x = (0.5/eps)*x*x + 0.5*eps
+            ag    = 0.5*(x + abs_x)
+
+        t_1 = ag
+        t_2 = 2.*ag*t_1 - 1.
+        t_3 = 2.*ag*t_2 - t_1
+        t_4 = 2.*ag*t_3 - t_2
+        t_5 = 2.*ag*t_4 - t_3
+        ag  = a_1*t_1 + a_3*t_3 + a_5*t_5
+
+        # Glottal flow
+
+        agf = ag + fenda*gl*sep
+
+        if agf > 0.:
+            rs      = (asub - agf)/(asub + agf)
+            ri      = (asupra - agf)/(asupra + agf)
+            aratio  = agf/aefect
+            delta_p = (1. + rs)*ps_in - (1. + ri)*pi_in
+            if delta_p >= 0:
+                ug_clean = agf*c1*(-aratio + math.sqrt(aratio*aratio + c2*delta_p))
+            else:
+                ug_clean = -agf*c1*(-aratio + math.sqrt(aratio*aratio - c2*delta_p))
+        else:
+            rs       = 1.
+            ri       = 1.
+            delta_p  = 2.*(ps_in - pi_in)
+            ug_clean = 0.
+
+        y    = na*normals[k, 0] + nb*n_y1 + nc*n_y2
+        n_y2 = n_y1
+        n_y1 = y
+
+        add_noise       = noise_scale*y
+        pulsatile_noise = add_noise*pulsatile*ug_clean
+
+        if reynolds:
+            re_numbersq      = ug_clean*ug_clean*c6
+            aspiration_noise = add_noise*c_asp*max(0., re_numbersq - 1440000.)/100.
+        else:
+            aspiration_noise = add_noise*c_asp*max(0., delta_p - 8000.)
+
+        noise = pulsatile_noise + aspiration_noise
+
+        if aphonia:
+            ug_clean = 0.
+
+        ug = ug_clean + noise
+
+        energ_clean      += ug_clean*ug_clean
+        energ_noise      += noise*noise
+        energ_aspiration += aspiration_noise*aspiration_noise
+        energ_pulsatile  += pulsatile_noise*pulsatile_noise
+
+        ps_out = rs*ps_in - c3*ug
+        pi_out = ri*pi_in + c4*ug
+
+        ps = ps_out + ps_in
+        pi = pi_out + pi_in
+
+        if agf > 0.:
+            pg = pi + c5*(ps - pi)*(w1 + w3)/sep
+        else:
+            pg = pi
+
+        # Elastic and collision forces
+
+        e_force1 = kstiff*w0
+        e_force2 = q*kstiff*w2
+
+        if ag <= 0.:
+            e_force1 = e_force1 + kstiff/(1 + q)*(w0 + w2 + sep)
+            e_force2 = e_force2 + q*kstiff*q/(1 + q)*(w0 + w2 + sep)
+
+        # Perturbations, drawn twice as in VFmodel._perturb
+
+        y    = wa*normals[k, 1] + wb*w_y1 + wc*w_y2
+        w_y2 = w_y1
+        w_y1 = y
+        wow_1 = c_wow*dW*y
+
+        y    = ta*normals[k, 2] + tb*t_y1 + tc*t_y2
+        t_y2 = t_y1
+        t_y1 = y
+        tremor_1 = c_tremor*dW*y
+
+        y    = fa*normals[k, 3] + fb*f_y1 + fc*f_y2 + fd*f_x2
+        f_y2 = f_y1
+        f_y1 = y
+        f_x2 = f_x1
+        f_x1 = normals[k, 3]
+        jitter_1 = c_flutter*dW*y
+
+        y    = wa*normals[k, 4] + wb*w_y1 + wc*w_y2
+        w_y2 = w_y1
+        w_y1 = y
+        wow_2 = c_wow*dW*y
+
+        y    = ta*normals[k, 5] + tb*t_y1 + tc*t_y2
+        t_y2 = t_y1
+        t_y1 = y
+        tremor_2 = c_tremor*dW*y
+
+        y    = fa*normals[k, 6] + fb*f_y1 + fc*f_y2 + fd*f_x2
+        f_y2 = f_y1
+        f_y1 = y
+        f_x2 = f_x1
+        f_x1 = normals[k, 6]
+        jitter_2 = c_flutter*dW*y
+
+        # Euler-Maruyama step
+
+        f1 = (-damping*(1 + eta*w0*w0)*w1 - e_force1 + pg)/mass
+        f3 = (-damping*(1 + eta*w2*w2)*w3 - e_force2 + pg)/mass
+        g1 = -(wow_1 + tremor_1 + jitter_1)*e_force1/mass
+        g3 = -(wow_2 + tremor_2 + jitter_2)*e_force2/mass
+
+        v0 = w0 + delta_t*w1 + 0.
+        v1 = w1 + delta_t*f1 + g1
+        v2 = w2 + delta_t*w3 + 0.
+        v3 = w3 + delta_t*f3 + g3
+        w0, w1, w2, w3 = v0, v1, v2, v3
+
+        m = n - offset
+        wg[m, 0] = w0
+        wg[m, 1] = w1
+        wg[m, 2] = w2
+        wg[m, 3] = w3
+        ag_out[m] = ag
+        ug_out[m] = ug
+
+        # Propagation in the vocal tract: two half steps, or one full-rate step
+        # (the same junction pass as the trachea, with the lips at the far end).
+        # Uncoupled runs take the backward wave at the glottis from the one-pole
+        # load and filter the flow afterwards
+
+        for i in range(0 if uncoupled else (2 if half else 1)):
+
+            p_forward_end = pf[ntubes-1]
+            if wall:
+                _wall_half_step(pf, pb, ploss, wcoef, i, scratch)
+            elif half:
+                _tract_half_step(pf, pb, refl, i, scratch)
+
+            if i == lips_step or not half:
+                if lips_fr:
+                    p_backward_end = (nr0*p_forward_end + nr1*lips_f - dr1*lips_b)/dr0
+                    p_lips         = (nt0*p_forward_end + nt1*lips_f - dt1*lips_p)/dt0
+                    lips_f         = p_forward_end
+                    lips_b         = p_backward_end
+                    lips_p         = p_lips
+                else:
+                    p_backward_end = r_lips*p_forward_end
+                    p_lips         = (1 - r_lips)*p_forward_end
+                p_end[m]     = p_lips
+                if half:
+                    pb[ntubes-1] = p_backward_end
+                else:
+                    _trachea_step(pf, pb, refl, pi_out, p_backward_end, scratch)
+
+            if i == 1:
+                pf[0] = pi_out
+
+        if uncoupled:
+            p_vt_glot_back = load_pole*p_vt_glot_back + load_gain*pi_out
+        else:
+            p_vt_glot_back = pb[0]
+
+        # Propagation in the trachea
+
+        _trachea_step(tpf, tpb, trefl, ps_out, p_lungs_back, scratch)
+        p_lungs_back  = pl[n] - r_lungs*tpf[tpf.size-1]
+        p_tr_sub_back = tpb[0]
+
+    w[0], w[1], w[2], w[3] = w0, w1, w2, w3
+
+    rstate[R_NOISE, 0], rstate[R_NOISE, 1]     = n_y1, n_y2
+    rstate[R_WOW, 0], rstate[R_WOW, 1]         = w_y1, w_y2
+    rstate[R_TREMOR, 0], rstate[R_TREMOR, 1]   = t_y1, t_y2
+    rstate[R_FLUTTER, 0], rstate[R_FLUTTER, 1] = f_y1, f_y2
+    rstate[R_FLUTTER, 2], rstate[R_FLUTTER, 3] = f_x1, f_x2
+
+    state[S_GLOT_BACK]    = p_vt_glot_back
+    state[S_SUB_BACK]     = p_tr_sub_back
+    state[S_LUNGS_BACK]   = p_lungs_back
+    state[S_LIPS_F]       = lips_f
+    state[S_LIPS_B]       = lips_b
+    state[S_LIPS_P]       = lips_p
+    state[S_E_CLEAN]      = energ_clean
+    state[S_E_NOISE]      = energ_noise
+    state[S_E_ASPIRATION] = energ_aspiration
+    state[S_E_PULSATILE]  = energ_pulsatile
+
+
+if numba is not None:
+    _tract_half_step = numba.njit(cache=True)(_tract_half_step_loop)
+    _wall_half_step  = numba.njit(cache=True)(_wall_half_step_loop)
+    _trachea_step    = numba.njit(cache=True)(_trachea_step_loop)
+    _voice_loop      = numba.njit(cache=True)(_voice_loop)
+else:
+    _tract_half_step = _tract_half_step_vec
+    _wall_half_step  = _wall_half_step_vec
+    _trachea_step    = _trachea_step_vec
+
+
+class FusedVoice(object):
+
+    """ Flat-array state and coefficients of one simulation, advanced by _voice_loop """
+
+    def __init__(self, area, trachea, pl, abduction, stiffness, config=None, generators=None):
+
+        par              = cfg.get_config(config)
+
+        if generators is None:
+            generators   = m2.make_generators(par.SEED)
+        self.__generators = generators
+        self.__pl        = pl
+        self.__abduction = abduction
+        self.__stiffness = stiffness
+
+        asupra = area[0]
+        asub   = trachea[0]
+        aw     = par.CORR_COUPLING*asupra
+
+        triangle_obj = triangle.Cos2Triangle()
+
+        coef                 = np.zeros(NCOEF)
+        coef[C_MEDIAL_AREA]  = par.GLOTTAL_LENGTH*par.GLOTTAL_DEPTH
+        coef[C_GL]           = par.GLOTTAL_LENGTH
+        coef[C_FENDA]        = par.FENDA
+        coef[C_Q]            = par.Q
+        coef[C_EPS]          = par.EPS_ROUNDING
+        coef[C_TRI_A1]       = triangle_obj.a_1
+        coef[C_TRI_A3]       = triangle_obj.a_3
+        coef[C_TRI_A5]       = triangle_obj.a_5
+        coef[C_ASUB]         = asub
+        coef[C_ASUPRA]       = asupra
+        coef[C_AEFECT]       = asub*aw/(asub + aw)
+        coef[C_C1]           = cfg.Constant.SOUND_SPEED/par.KT
+        coef[C_C2]           = 2.*par.KT/cfg.Constant.SOUND_SPEED**2./cfg.Constant.DENSITY_AIR
+        coef[C_C3]           = cfg.Constant.SOUND_SPEED*cfg.Constant.DENSITY_AIR/asub
+        coef[C_C4]           = cfg.Constant.SOUND_SPEED*cfg.Constant.DENSITY_AIR/aw
+        coef[C_C5]           = 2.*par.TAU/par.KT
+        if par.REYNOLDS == "Yes":
+            coef[C_C6]       = (cfg.Constant.DENSITY_AIR/par.GLOTTAL_LENGTH/
+                                cfg.Constant.VISCOSITY_AIR)**2
+            coef[C_REYNOLDS] = 1.
+        coef[C_NOISE_SCALE]  = np.sqrt(par.FS)/100000.
+        coef[C_PULSATILE]    = par.PULSATILE
+        coef[C_ASPIRATION]   = par.ASPIRATION*par.ASPIRATION_SCALE
+        coef[C_APHONIA]      = 1. if par.APHONIA == True else 0.
+        coef[C_DAMPING]      = par.DAMPING/coef[C_MEDIAL_AREA]
+        coef[C_MASS]         = par.MASS/coef[C_MEDIAL_AREA]
+        coef[C_ETA]          = par.ETA
+        coef[C_DELTA_T]      = par.DELTA_T
+        coef[C_DW]           = np.sqrt(par.DELTA_T)
+        coef[C_WOW]          = par.WOW_SIZE*par.WOW_SCALE
+        coef[C_TREMOR]       = par.TREMOR_SIZE*par.TREMOR_SCALE
+        coef[C_FLUTTER]      = par.FLUTTER_SIZE*par.FLUTTER_SCALE
+        coef[C_R_LUNGS]      = par.REFLEXION_LUNGS
+        coef[C_R_LIPS]       = par.REFLEXION_LIPS
+
+        if par.LIPS_FR == True:
+            radi = np.sqrt(area[-1]/np.pi)
+            r    = 128./(9.*np.pi*np.pi)*par.CORR_LIPS
+            l    = 2.*par.FS*(8.*radi)/(3.*np.pi*cfg.Constant.SOUND_SPEED)
+            coef[C_LIPS_FR] = 1.
+            coef[C_NR0]     = -r - l + r*l
+            coef[C_NR1]     = -r + l - r*l
+            coef[C_DR0]     =  r + l + r*l
+            coef[C_DR1]     =  r - l - r*l
+            coef[C_NT0]     =  2*r*l
+            coef[C_NT1]     = -2*r*l
+            coef[C_DT0]     =  r + 2*l
+            coef[C_DT1]     =  r - 2*l
+
+        coef[C_HALF]         = 1. if par.HALF_SAMPLING == "Yes" else 0.
+        coef[C_WALL]         = 1. if par.WALL_VIBR == True else 0.
+        coef[C_UNCOUPLED]    = 1. if par.UNCOUPLED == True else 0.
+        if par.UNCOUPLED == True:
+            (coef[C_LOAD_POLE],
+             coef[C_LOAD_GAIN]) = vtm.get_glottal_load(area, par)
+
+        self.__coef  = coef
+        self.__rcoef = np.zeros((4, 4))
+
+        for row, filter_obj in ((R_NOISE,   r2.TwoPoles(0., 1200., par.FS)),
+                                (R_WOW,     r2.TwoPoles(par.WOW_FREQUENCY,
+                                                        par.WOW_BW, par.FS)),
+                                (R_TREMOR,  r2.TwoPoles(par.TREMOR_FREQUENCY,
+                                                        par.TREMOR_BW, par.FS)),
+                                (R_FLUTTER, r2.TwoPolesZeros(par.FLUTTER_FREQUENCY,
+                                                             par.FLUTTER_BW, par.FS))):
+            self.__rcoef[row, :3] = (filter_obj.a, filter_obj.b, filter_obj.c)
+            if row == R_FLUTTER:
+                self.__rcoef[row, 3] = filter_obj.d
+
+        self.__rstate  = np.zeros((4, 4))
+        self.__w       = np.array([0., 1, 0., 0.])
+
+        # Waves in par.DTYPE; fold state, filter memories and accumulators in double
+
+        dtype          = par.DTYPE
+        self.__refl    = ((area[:-1] - area[1:])/(area[:-1] + area[1:])).astype(dtype)
+        self.__pf      = np.zeros(area.size, dtype)
+        self.__pb      = np.zeros(area.size, dtype)
+        self.__trefl   = ((trachea[:-1] - trachea[1:])/(trachea[:-1] + trachea[1:])).astype(dtype)
+        self.__tpf     = np.zeros(trachea.size, dtype)
+        self.__tpb     = np.zeros(trachea.size, dtype)
+        self.__scratch = np.zeros(max(area.size, trachea.size), dtype)
+
+        # Loss waves and junction coefficients of the wall vibration model
+
+        if par.WALL_VIBR == True:
+            self.__wcoef = np.array(vtm.WallVibration(area, par).get_junction_coefficients())
+        else:
+            self.__wcoef = np.zeros((6, area.size - 1), dtype)
+        self.__ploss   = np.zeros(area.size, dtype)
+
+        self.__state   = np.zeros(NSTATE)
+        self.__state[S_LUNGS_BACK]   = pl[0]
+        self.__state[S_E_NOISE]      = 1.e-12
+        self.__state[S_E_ASPIRATION] = 1.e-12
+        self.__state[S_E_PULSATILE]  = 1.e-12
+
+    def run(self, n0, n1, p_end, wg, ag, ug, offset=0):
+
+        """ Advance samples n0 to n1 - 1, writing signals at index n - offset """
+
+        normals = m2.draw_normals(self.__generators, n1 - n0)
+
+        _voice_loop(n0, n1, offset, self.__pl, self.__abduction, self.__stiffness, normals,
+                    self.__coef, self.__rcoef, self.__rstate, self.__w, self.__pf, self.__pb,
+                    self.__refl, self.__ploss, self.__wcoef, self.__tpf, self.__tpb,
+                    self.__trefl, self.__scratch,
+                    self.__state, p_end, wg, ag, ug)
+
+    def set_perturbation_sizes(self, wow=None, tremor=None, flutter=None, config=None):
+
+        """ Change the wow, tremor and flutter sizes for the following samples """
+
+        par = cfg.get_config(config)
+
+        if wow is not None:
+            self.__coef[C_WOW]     = wow*par.WOW_SCALE
+        if tremor is not None:
+            self.__coef[C_TREMOR]  = tremor*par.TREMOR_SCALE
+        if flutter is not None:
+            self.__coef[C_FLUTTER] = flutter*par.FLUTTER_SCALE
+
+    def get_state(self):
+
+        """ Copies of the dynamic arrays (fold vector, waves, resonator memories,
+            and scalar state) """
+
+        return {"w":       self.__w.copy(),
+                "pf":      self.__pf.copy(),
+                "pb":      self.__pb.copy(),
+                "tpf":     self.__tpf.copy(),
+                "tpb":     self.__tpb.copy(),
+                "ploss":   self.__ploss.copy(),
+                "rstate":  self.__rstate.copy(),
+                "state":   self.__state.copy()}
+
+    def set_state(self, state):
+
+        # In place: the arrays keep their dtype and shapes must agree
+
+        for name, target in (("w", self.__w), ("pf", self.__pf), ("pb", self.__pb),
+                             ("tpf", self.__tpf), ("tpb", self.__tpb), ("ploss", self.__ploss),
+                             ("rstate", self.__rstate), ("state", self.__state)):
+            target[:] = state[name]
+
+    def get_flow_to_noise_ratio(self):
+
+        energ_clean = self.__state[S_E_CLEAN]
+
+        yop1 = 10.*np.log10(energ_clean/self.__state[S_E_ASPIRATION])
+        yop2 = 10.*np.log10(energ_clean/self.__state[S_E_PULSATILE])
+        yop3 = 10.*np.log10(energ_clean/self.__state[S_E_NOISE])
+
+        return (yop1, yop2, yop3)
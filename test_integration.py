@@ -22,10 +22,10 @@ print("Test 2: Female voice with jitter")
 params = VoiceParameters(
     gender="Female",
     jitter=5.0,
-    mass=0.12
-    damping=0.015
-    stiffness=185.0
-    glottal_length=1.0 
+    mass=0.12,
+    damping=0.015,
+    stiffness=185.0,
+    glottal_length=1.0,
     glottal_depth=0.25
 )
 start = time.time()
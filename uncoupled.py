@@ -0,0 +1,131 @@
+# -*- coding: utf-8 -*-
+
+"""
+Accuracy and speed of the uncoupled source-filter approximation
+(VoiceParameters.uncoupled, config UNCOUPLED = True) against the coupled run.
+
+In uncoupled mode the two-mass source sees a fixed low-order glottal load in
+place of the vocal tract (vocal_tract.get_glottal_load): a one-pole reflectance
+with the gain and the mean delay of the tract reflectance at the glottis, so the
+inertance of the tract at low frequencies, which skews the flow pulse, but no
+formants. The trachea is as usual. The lips output is then the glottal flow
+filtered by vocal_tract.UncoupledTract: the tract transfer of
+get_tract_responses closed at the glottis, with the viscous and wall losses and
+the lips radiation of the configuration, applied by FFT. The source runs in the
+fused kernel whatever the tract options, so the approximation pays off only for
+the runs that the kernel does not cover (viscous losses, reflectance engine);
+Synthesis warns when UNCOUPLED is set on a configuration the kernel covers.
+
+Results of compare_presets() (presets of simuvox_api.PRESETS, 1.5 s, seed 1,
+jitter 1, time of the second run of each mode; the speedups with losses vary
+by some 50% between runs):
+
+    preset  losses  speedup  rms err  LTAS err  df0 (Hz)  djitter (%)  dOQ    dSB (Hz)  dSR (dB)
+    Male    no      0.7      1.39     4.2 dB    0.38      0.086        0.012  2099      1.2
+    Male    yes     79       1.31     4.1 dB    0.37      0.011        0.011  1816      1.0
+    Female  no      0.7      1.45     5.0 dB    1.98      0.028        0.016   444      0.0
+    Female  yes     145      1.53     4.8 dB    1.86      0.030        0.016   339      0.1
+
+"rms err" is the rms of the difference of the audio in the analysis window,
+relative to the rms of the coupled audio: the waveforms do not line up, since
+f0 shifts slightly. "LTAS err" is the mean absolute difference of the
+long-term spectra in 250 Hz bands up to 5 kHz. With the characteristic
+impedance of the first tube as the load, as before, the LTAS differed by 8-11 dB,
+f0 by 3-4 Hz and OQ by 0.05-0.07. What is left comes from the formants: the flow
+has no formant ripple, which moves its spectral balance (computed on the flow,
+over the whole band) by up to 2 kHz for the male voice, and the formants of the
+closed tract are sharper than with the time-varying glottal damping. The mode
+is meant for screening parameter grids and for previews, not for final results.
+
+Run this module to repeat the comparison.
+"""
+
+import time
+import numpy             as np
+import spectral_par      as sp
+import simuvox_api       as api
+
+
+MEASURES = ("f0", "jitter_percent", "open_quotient", "snr_db", "spectral_balance",
+            "spectral_ratio")
+
+
+def _ltas(signal, fs, fmax=5000., band=250.):
+
+    spectrum  = np.abs(np.fft.rfft(signal*np.hanning(signal.size)))**2
+    frequency = np.fft.rfftfreq(signal.size, 1./fs)
+
+    return np.array([10.*np.log10(np.sum(spectrum[(frequency >= low) & (frequency < low + band)]))
+                     for low in np.arange(0., fmax, band)])
+
+
+def _timed(engine, params):
+
+    start  = time.perf_counter()
+    result = engine.synthesize(params)
+
+    return result, time.perf_counter() - start
+
+
+def compare(params, engine=None):
+
+    """ Differences between the coupled and uncoupled runs of params, and the
+        speedup of the uncoupled one """
+
+    if engine is None:
+        engine = api.SimuVoxEngine(cache=False, warm_start=False)
+
+    coupled_params   = api.VoiceParameters(**dict(vars(params), uncoupled=False))
+    uncoupled_params = api.VoiceParameters(**dict(vars(params), uncoupled=True))
+
+    # The first runs compile the kernel and compute the tract responses
+
+    engine.synthesize(coupled_params)
+    engine.synthesize(uncoupled_params)
+
+    (coupled, time_coupled)     = _timed(engine, coupled_params)
+    (uncoupled, time_uncoupled) = _timed(engine, uncoupled_params)
+
+    if not (coupled.success and uncoupled.success):
+        raise RuntimeError(coupled.error_message or uncoupled.error_message)
+
+    config           = engine._configure(params)
+    (n0, n1)         = sp.get_analysis_window(config)
+    reference        = coupled.audio[n0:n1].astype(float)
+    approximation    = uncoupled.audio[n0:n1].astype(float)
+
+    report = {"speedup":       time_coupled/time_uncoupled,
+              "rms_error":     float(np.sqrt(np.mean((reference - approximation)**2)/
+                                             np.mean(reference**2))),
+              "ltas_error_db": float(np.mean(np.abs(_ltas(reference, config.FS) -
+                                                    _ltas(approximation, config.FS))))}
+
+    for name in MEASURES:
+        report[name] = abs(getattr(uncoupled, name) - getattr(coupled, name))
+
+    return report
+
+
+def compare_presets(seed=1, jitter=1.0):
+
+    """ compare() for the default male and female voices (api.PRESETS), without and
+        with the viscous and wall losses """
+
+    engine = api.SimuVoxEngine(cache=False, warm_start=False)
+
+    return dict(((gender, losses),
+                 compare(api.VoiceParameters(gender=gender, seed=seed, jitter=jitter,
+                                             viscous_loss=losses, wall_vibration=losses,
+                                             **api.PRESETS[gender]),
+                         engine))
+                for gender in ("Male", "Female") for losses in (False, True))
+
+
+if __name__ == "__main__":
+
+    for (gender, losses), report in compare_presets().items():
+        print("%-7s %-4s speedup %.1f  rms %.2f  LTAS %.1f dB  df0 %.2f  djitter %.3f  "
+              "dOQ %.3f  dSB %.0f  dSR %.1f" %
+              (gender, "yes" if losses else "no", report["speedup"], report["rms_error"],
+               report["ltas_error_db"], report["f0"], report["jitter_percent"],
+               report["open_quotient"], report["spectral_balance"], report["spectral_ratio"]))
@@ -6,66 +6,127 @@ Created on Fri Oct 05 13:05:12 2012
 @author: Jorge C. Lucero
 """
 
+import threading
+import collections
 import config    as cfg
 import numpy as np
 
 
+# Filter polynomials of the viscous losses by quantized tube area and sampling
+# options, shared by all the tracts with a time-varying area function
+
+_viscous_polynomials = {}
+
+
+def _junctions(tubes, ntubes):
+
+    """ Junctions (between tubes j and j + 1) next to the given tubes """
+
+    near                   = np.zeros(ntubes + 1, bool)
+    near[tubes + 1]        = True
+    near[tubes]            = True
+
+    return np.flatnonzero(near[1:ntubes])
+
+
 
 class ViscousLosses(object):
     
-    """ Acoustic losses by thermal conduction and viscosity, Abel (2003)."""
+    """ Acoustic losses by thermal conduction and viscosity, Abel (2003).
+
+        The input and output memories of the per-tube filters are ring buffers
+        written twice, at columns k and k + length, so that the last length
+        samples are always the contiguous view [k, k + length), newest first.
+        Each sample writes one column instead of shifting the whole memory.
+
+        With a time-varying area function (set_area) the filter polynomials are
+        taken from a cache by area quantized in relative steps of AREA_STEP. """
+
+    AREA_STEP = 1e-3
     
-    def __init__(self,area):
+    def __init__(self, area, config=None):
         
+        self.__par      = cfg.get_config(config)
         self.__area     = area
         self.__ntubes   = area.size
-        self.__pf       = np.zeros((self.__ntubes,cfg.Param.NVOCAL + 1))
-        self.__pb       = np.zeros((self.__ntubes,cfg.Param.NVOCAL + 1))
-        self.__pfloss   = np.zeros((self.__ntubes,cfg.Param.NVOCAL + 1))
-        self.__pbloss   = np.zeros((self.__ntubes,cfg.Param.NVOCAL + 1))
+        self.__levels   = np.full(area.size, np.iinfo(int).min)   # quantized areas (none yet)
+
+        # The filter memories stay in double precision whatever DTYPE: the poles of
+        # the high-order loss filters are close to the unit circle, and their
+        # rounding errors in single precision grow into the waves. Only the
+        # filtered waves are returned in DTYPE
+
+        nvocal          = self.__par.NVOCAL
+        self.__pf       = np.zeros((self.__ntubes, 2*(nvocal + 1)))
+        self.__pb       = np.zeros((self.__ntubes, 2*(nvocal + 1)))
+        self.__pfloss   = np.zeros((self.__ntubes, 2*nvocal))
+        self.__pbloss   = np.zeros((self.__ntubes, 2*nvocal))
+
+        # Newest input and output columns of the full-rate stream and of the two
+        # half-sampling streams (disjoint rows, one update each per sample)
+
+        self.__ipos     = {None: 0, 0: 0, 1: 0}
+        self.__opos     = {None: 0, 0: 0, 1: 0}
  
+        # The filter coefficients stay in double precision (high-order products)
+
         self.__nvisq, self.__dvisq = self._mfilter()
+
+        # Rows of the forward and backward filters: tube j feeds junction j forward
+        # and junction j-1 backward
+
+        self.__rows     = {None: (slice(0, -1), slice(0, -1), slice(1, None)),
+                           0:    (slice(0, -1, 2), slice(1, None, 2), slice(1, None, 2)),
+                           1:    (slice(1, -1, 2), slice(2, None, 2), slice(2, None, 2))}
+        self.__coefs    = {}
+        for key, (rows_f, rows_b, coef_b) in self.__rows.items():
+            self.__coefs[key] = (self.__nvisq[rows_f], self.__dvisq[rows_f, 1:],
+                                 self.__nvisq[coef_b], self.__dvisq[coef_b, 1:])
                 
     def _mfilter(self):
     
-        num_visq = np.zeros((self.__ntubes, cfg.Param.NVOCAL + 1))
-        den_visq = np.zeros((self.__ntubes, cfg.Param.NVOCAL + 1))    
+        num_visq = np.zeros((self.__ntubes, self.__par.NVOCAL + 1))
+        den_visq = np.zeros((self.__ntubes, self.__par.NVOCAL + 1))    
     
         for n in range(self.__ntubes):
     
-            a1, b0, b1 = self._filtercoef(1, n)
-
-            n1 = np.array([b0, b1])
-            d1 = np.array([1, a1])
+            num_visq[n, :], den_visq[n, :] = self._polynomials(self.__area[n])
             
-            for i in range(2, cfg.Param.NVOCAL + 1):
-                
-                a1, b0, b1 = self._filtercoef(i,n)
-                
-                n1 = np.polymul(n1, np.array([b0, b1]))
-                d1 = np.polymul(d1, np.array([1, a1]))
+        return num_visq, den_visq
 
-            num_visq[n, :] = n1
-            den_visq[n, :] = d1
+
+    def _polynomials(self, area):
+
+        a1, b0, b1 = self._filtercoef(1, area)
+
+        n1 = np.array([b0, b1])
+        d1 = np.array([1, a1])
+        
+        for i in range(2, self.__par.NVOCAL + 1):
             
-        return num_visq, den_visq
+            a1, b0, b1 = self._filtercoef(i, area)
+            
+            n1 = np.convolve(n1, np.array([b0, b1]))
+            d1 = np.convolve(d1, np.array([1, a1]))
+
+        return n1, d1
 
 
-    def _filtercoef(self, i, n):
+    def _filtercoef(self, i, area):
             
         gamma   = cfg.Constant.THERMAL_AIR/2.
         sqrt_pr = np.sqrt(cfg.Constant.PRANDTL_AIR)
         A_alpha = 2.*np.sqrt(gamma)
         B_alpha = (1. + (gamma - 1.)/sqrt_pr)/np.sqrt(2.)        
-        ft      = ((i - .5)/cfg.Param.NVOCAL)**3
-        k       = np.array(range(1, cfg.Param.NVOCAL + 1))
-        den     = np.sum(np.sqrt((k - .5)/cfg.Param.NVOCAL))
-        num     = np.sqrt((i - .5)/cfg.Param.NVOCAL)
-        rv      = self.__area[n]/np.sqrt(cfg.Constant.VISCOSITY_AIR/(cfg.Constant.DENSITY_AIR*\
-                  np.pi*cfg.Param.FS))
-        alpha_a = np.pi*cfg.Param.FS/(cfg.Constant.SOUND_SPEED*rv)*(A_alpha + \
+        ft      = ((i - .5)/self.__par.NVOCAL)**3
+        k       = np.array(range(1, self.__par.NVOCAL + 1))
+        den     = np.sum(np.sqrt((k - .5)/self.__par.NVOCAL))
+        num     = np.sqrt((i - .5)/self.__par.NVOCAL)
+        rv      = area/np.sqrt(cfg.Constant.VISCOSITY_AIR/(cfg.Constant.DENSITY_AIR*\
+                  np.pi*self.__par.FS))
+        alpha_a = np.pi*self.__par.FS/(cfg.Constant.SOUND_SPEED*rv)*(A_alpha + \
                   B_alpha*rv/cfg.Constant.THERMAL_AIR)/(1+rv/cfg.Constant.THERMAL_AIR)
-        g_pi    = np.exp(-num/den*cfg.Param.LTUBE*alpha_a)
+        g_pi    = np.exp(-num/den*self.__par.LTUBE*alpha_a)
         rho     = np.sin(np.pi/2.*(ft - .5))/np.sin(np.pi/2.*(ft + .5))
     
         if g_pi == 1.:
@@ -84,68 +145,164 @@ class ViscousLosses(object):
         return a1, b0, b1     
 
 
-    def addloss(self,p_forward,p_backward):
+    def set_area(self, area, tubes):
 
-        self.__pf[:-1,1:]  = self.__pf[:-1,:-1]        
-        self.__pf[:-1,0]   = p_forward
-        
-        self.__pb[:-1,1:]  = self.__pb[:-1,:-1]        
-        self.__pb[:-1,0]   = p_backward
+        """ New areas of the given tubes. Only the tubes whose quantized area changed
+            get new filter polynomials, computed once per quantized area """
 
-        pfloss = np.sum(self.__nvisq[:-1,:]*self.__pf[:-1,:cfg.Param.NVOCAL + 1], axis=1)\
-                         - np.sum(self.__dvisq[:-1,1:]*self.__pfloss[:-1,:cfg.Param.NVOCAL], axis=1)
-        pbloss = np.sum(self.__nvisq[1:,:]*self.__pb[:-1,:cfg.Param.NVOCAL + 1],axis=1)\
-                         - np.sum(self.__dvisq[1:,1:]*self.__pbloss[:-1,0:cfg.Param.NVOCAL],axis=1)
-        
-        self.__pfloss[:-1,1:] = self.__pfloss[:-1,:-1]            
-        self.__pfloss[:-1,0]  = pfloss           
-        self.__pbloss[:-1,1:] = self.__pbloss[:-1,:-1]            
-        self.__pbloss[:-1,0]  = pbloss            
+        step   = np.log1p(self.AREA_STEP)
+        levels = np.rint(np.log(area[tubes])/step).astype(int)
+        moved  = levels != self.__levels[tubes]
+        config = (self.__par.FS, self.__par.LTUBE, self.__par.NVOCAL)
+
+        for (n, level) in zip(tubes[moved], levels[moved]):
+            key = (level,) + config
+            if key not in _viscous_polynomials:
+                _viscous_polynomials[key] = self._polynomials(np.exp(level*step))
+
+            # In place: the coefficient views of _filter follow
+
+            (self.__nvisq[n], self.__dvisq[n]) = _viscous_polynomials[key]
+            self.__levels[n] = level
+
+    def addloss(self,p_forward,p_backward):
 
-        return pfloss,pbloss
+        return self._filter(p_forward, p_backward, None)
 
     def addloss_half(self,p_forward,p_backward,i):
 
-        self.__pf[i:-1:2,1:]  = self.__pf[i:-1:2,:-1]        
-        self.__pf[i:-1:2,0]   = p_forward
-        
-        self.__pb[i+1::2,1:]  = self.__pb[i+1::2,:-1]        
-        self.__pb[i+1::2,0]   = p_backward
+        return self._filter(p_forward, p_backward, i)
 
-        pfloss = np.sum(self.__nvisq[i:-1:2,:]*self.__pf[i:-1:2,:cfg.Param.NVOCAL + 1], axis=1)\
-                         - np.sum(self.__dvisq[i:-1:2,1:]*self.__pfloss[i:-1:2,:cfg.Param.NVOCAL], axis=1)
-        pbloss = np.sum(self.__nvisq[i+1::2,:]*self.__pb[i+1::2,:cfg.Param.NVOCAL + 1],axis=1)\
-                         - np.sum(self.__dvisq[i+1::2,1:]*self.__pbloss[i+1::2,0:cfg.Param.NVOCAL],axis=1)
-        
-        self.__pfloss[i:-1:2,1:] = self.__pfloss[i:-1:2,:-1]            
-        self.__pfloss[i:-1:2,0]  = pfloss           
-        self.__pbloss[i+1::2,1:] = self.__pbloss[i+1::2,:-1]            
-        self.__pbloss[i+1::2,0]  = pbloss            
+    def _filter(self, p_forward, p_backward, key):
+
+        (rows_f, rows_b, _)          = self.__rows[key]
+        (nv_f, dv_f, nv_b, dv_b)     = self.__coefs[key]
+        nx                           = self.__par.NVOCAL + 1
+        ny                           = self.__par.NVOCAL
+
+        k = self.__ipos[key] = (self.__ipos[key] - 1) % nx
+
+        self.__pf[rows_f, k]      = p_forward
+        self.__pf[rows_f, k + nx] = p_forward
+        self.__pb[rows_b, k]      = p_backward
+        self.__pb[rows_b, k + nx] = p_backward
+
+        j = self.__opos[key]
+
+        pfloss = np.einsum("ij,ij->i", nv_f, self.__pf[rows_f, k:k + nx])\
+                         - np.einsum("ij,ij->i", dv_f, self.__pfloss[rows_f, j:j + ny])
+        pbloss = np.einsum("ij,ij->i", nv_b, self.__pb[rows_b, k:k + nx])\
+                         - np.einsum("ij,ij->i", dv_b, self.__pbloss[rows_b, j:j + ny])
 
-        return pfloss,pbloss         
+        j = self.__opos[key] = (j - 1) % ny
+
+        self.__pfloss[rows_f, j]      = pfloss
+        self.__pfloss[rows_f, j + ny] = pfloss
+        self.__pbloss[rows_b, j]      = pbloss
+        self.__pbloss[rows_b, j + ny] = pbloss
+
+        dtype = self.__par.DTYPE
+
+        return pfloss.astype(dtype, copy=False), pbloss.astype(dtype, copy=False)
+
+    def get_state(self):
+
+        return (self.__pf.copy(), self.__pb.copy(), self.__pfloss.copy(), self.__pbloss.copy(),
+                dict(self.__ipos), dict(self.__opos))
+
+    def set_state(self, state):
+
+        for buffer, value in zip((self.__pf, self.__pb, self.__pfloss, self.__pbloss), state):
+            buffer[:] = value
+
+        self.__ipos = dict(state[4])
+        self.__opos = dict(state[5])
 
 class WallVibration(object):
     
     """ Reflexion coefcicients including acoustic losses by wall vibration at the vocal tract, 
         Flanagan et al. (1972)."""    
+
+    # Rows of the junction table used by scatter_half: 2 r1, r213, 2 r3, r123, 2 r2, r312
+
+    HALF_ROWS = [6, 3, 8, 4, 7, 5]
     
-    def __init__(self, area):
+    def __init__(self, area, config=None):
         
-        circ      = 2*np.sqrt(area*np.pi)    
-        si        = cfg.Constant.DENSITY_AIR*circ*cfg.Param.LTUBE**2/cfg.Param.LP
-        sr        = cfg.Constant.DENSITY_AIR*cfg.Constant.SOUND_SPEED*circ*cfg.Param.LTUBE/(cfg.Param.CORR_LOSS*cfg.Param.RP)      
+        self.__par = cfg.get_config(config)
 
-        self.__rv =  (si - sr)/(si + sr) 
+        self.__area = np.array(area, dtype=float)
+        (si, rv)    = self._walls(self.__area)
+        self.__si   = si
+
+        dtype     = self.__par.DTYPE
+
+        self.__rv =  rv.astype(dtype) 
         
-        self.__r1 = area[:-1]/(area[:-1] + area[1:] + si[:-1])
-        self.__r2 = area[1:]/(area[:-1] + area[1:] + si[:-1])
-        self.__r3 = si[:-1]/(area[:-1] + area[1:] + si[:-1])
+        (r1, r2, r3) = self._scattering(self.__area[:-1], self.__area[1:], si[:-1])
+
+        # All the junction coefficients in one table: r1, r2, r3, r213, r123, r312
+        # and the precombined 2 r1, 2 r2, 2 r3 of the in-place junction kernels
+        # scatter and scatter_half, so that set_area updates them at once
 
-        self.__r213 = self.__r2 - self.__r1 - self.__r3
-        self.__r123 = self.__r1 - self.__r2 - self.__r3
-        self.__r312 = self.__r3 - self.__r1 - self.__r2
+        self.__table    = self._combine(r1, r2, r3).astype(dtype)
 
-        self.__p_in_loss  = np.zeros(len(area)-1)
+        (self.__r1, self.__r2, self.__r3, self.__r213, self.__r123, self.__r312,
+         self.__r1x2, self.__r2x2, self.__r3x2) = self.__table
+
+        self.__p_in_loss  = np.zeros(len(area)-1, dtype)
+
+        # Scratch buffers and coefficients of scatter_half by parity
+
+        self.__rv_junct = self.__rv[:-1].copy()
+        self.__halves   = [self.__table[self.HALF_ROWS, i::2].copy() for i in range(2)]
+        self.__half     = [tuple(half) for half in self.__halves]
+        self.__tmp      = np.zeros(len(area)-1, dtype)
+        self.__tmp_loss = np.zeros(len(area)-1, dtype)
+
+    def _walls(self, area):
+
+        """ Wall inertance term and reflexion coefficient of the wall loss memory """
+
+        circ      = 2*np.sqrt(area*np.pi)    
+        si        = cfg.Constant.DENSITY_AIR*circ*self.__par.LTUBE**2/self.__par.LP
+        sr        = cfg.Constant.DENSITY_AIR*cfg.Constant.SOUND_SPEED*circ*self.__par.LTUBE/(self.__par.CORR_LOSS*self.__par.RP)      
+
+        return si, (si - sr)/(si + sr)
+
+    def _scattering(self, area, area_p1, si):
+
+        r1        = area/(area + area_p1 + si)
+        r2        = area_p1/(area + area_p1 + si)
+        r3        = si/(area + area_p1 + si)
+
+        return r1, r2, r3
+
+    def _combine(self, r1, r2, r3):
+
+        return np.array([r1, r2, r3, r2 - r1 - r3, r1 - r2 - r3, r3 - r1 - r2,
+                         2.*r1, 2.*r2, 2.*r3])
+
+    def set_area(self, area, tubes):
+
+        """ New areas of the given tubes; only their walls and the junctions next to
+            them are recomputed """
+
+        self.__area[tubes] = area[tubes]
+        (self.__si[tubes], self.__rv[tubes]) = self._walls(self.__area[tubes])
+
+        j            = _junctions(tubes, self.__area.size)
+        (r1, r2, r3) = self._scattering(self.__area[j], self.__area[j + 1], self.__si[j])
+
+        self.__table[:, j] = self._combine(r1, r2, r3)
+        self.__rv_junct[j] = self.__rv[j]
+
+        for i in range(2):
+            if j.size == self.__area.size - 1:
+                self.__halves[i][:] = self.__table[self.HALF_ROWS, i::2]
+            else:
+                ji = j[j % 2 == i]
+                self.__halves[i][:, ji//2] = self.__table[:, ji][self.HALF_ROWS]
         
 
 #    def propagation(self,p_in_forward,p_in_backward_p1,p_in_loss):
@@ -185,16 +342,113 @@ class WallVibration(object):
         self.__p_in_loss = self.__rv[i:-1:2]*p_out_loss
 
         return p_out_forward_p1, p_out_backward, p_out_loss
+
+    def scatter(self, p_in_forward, p_in_backward_p1, p_out_forward_p1, p_out_backward,
+                p_out_loss):
+
+        """ propagation without temporaries: the outputs are written into the given
+            arrays, which must not overlap the inputs """
+
+        if p_out_forward_p1.dtype != np.result_type(self.__r1x2, p_in_forward):
+            (p_out_forward_p1[:], p_out_backward[:],
+             p_out_loss[:]) = self.propagation(p_in_forward, p_in_backward_p1, None)
+            return
+
+        t = self.__tmp
+
+        np.multiply(self.__r1x2, p_in_forward, out=p_out_forward_p1)
+        np.multiply(self.__r213, p_in_backward_p1, out=t)
+        p_out_forward_p1 += t
+        np.multiply(self.__r3x2, self.__p_in_loss, out=t)
+        p_out_forward_p1 += t
+
+        np.multiply(self.__r123, p_in_forward, out=p_out_backward)
+        np.multiply(self.__r2x2, p_in_backward_p1, out=t)
+        p_out_backward += t
+        np.multiply(self.__r3x2, self.__p_in_loss, out=t)
+        p_out_backward += t
+
+        np.multiply(self.__r1x2, p_in_forward, out=p_out_loss)
+        np.multiply(self.__r2x2, p_in_backward_p1, out=t)
+        p_out_loss += t
+        np.multiply(self.__r312, self.__p_in_loss, out=t)
+        p_out_loss += t
+
+        np.multiply(self.__rv_junct, p_out_loss, out=self.__p_in_loss)
+
+    def scatter_half(self, p_in_forward, p_in_backward_p1, p_loss, p_out_forward_p1,
+                     p_out_backward, i):
+
+        """ propagation_half without temporaries. p_loss holds the loss waves of the
+            junctions of parity i and is updated in place; the wave outputs are
+            written into the given arrays (e.g. strided views of the tract waves),
+            which must not overlap the inputs """
+
+        # Single-precision waves with double-precision inputs (viscous losses) are
+        # summed in double, as in propagation_half
+
+        if p_out_forward_p1.dtype != np.result_type(self.__r1x2, p_in_forward):
+            (p_out_forward_p1[:], p_out_backward[:],
+             p_loss[:]) = self.propagation_half(p_in_forward, p_in_backward_p1, p_loss, i)
+            return
+
+        (r1x2, r213, r3x2, r123, r2x2, r312) = self.__half[i]
+
+        n        = r1x2.size
+        t        = self.__tmp[:n]
+        out_loss = self.__tmp_loss[:n]
+
+        np.multiply(r1x2, p_in_forward, out=p_out_forward_p1)
+        np.multiply(r213, p_in_backward_p1, out=t)
+        p_out_forward_p1 += t
+        np.multiply(r3x2, p_loss, out=t)
+        p_out_forward_p1 += t
+
+        np.multiply(r123, p_in_forward, out=p_out_backward)
+        np.multiply(r2x2, p_in_backward_p1, out=t)
+        p_out_backward += t
+        np.multiply(r3x2, p_loss, out=t)
+        p_out_backward += t
+
+        np.multiply(r1x2, p_in_forward, out=out_loss)
+        np.multiply(r2x2, p_in_backward_p1, out=t)
+        out_loss += t
+        np.multiply(r312, p_loss, out=t)
+        out_loss += t
+
+        p_loss[:] = out_loss
+
+    def get_junction_coefficients(self):
+
+        """ Precombined coefficients (2 r1, r213, 2 r3, r123, 2 r2, r312) of the junctions """
+
+        return (self.__r1x2, self.__r213, self.__r3x2, self.__r123, self.__r2x2, self.__r312)
+
+    def get_state(self):
+
+        return self.__p_in_loss.copy()
+
+    def set_state(self, state):
+
+        self.__p_in_loss = state.copy()
         
 class ReflexionCoef(object):
         
-    def __init__(self, area):
+    def __init__(self, area, dtype=float):
     
-        self.__reflex = (area[:-1] - area[1:])/(area[:-1] + area[1:])
-        self.p_out_forward_p1 = np.zeros(len(area))
-        self.p_out_backward   = np.zeros(len(area)) 
+        self.__reflex = ((area[:-1] - area[1:])/(area[:-1] + area[1:])).astype(dtype)
+        self.p_out_forward_p1 = np.zeros(len(area), dtype)
+        self.p_out_backward   = np.zeros(len(area), dtype) 
         self.__ntubes = len(area)
 
+    def set_area(self, area, tubes):
+
+        """ New areas of the given tubes; only the junctions next to them are
+            recomputed """
+
+        j                = _junctions(tubes, self.__ntubes)
+        self.__reflex[j] = (area[j] - area[j + 1])/(area[j] + area[j + 1])
+
     def propagation(self, p_in_forward, p_in_backward_p1, p_vt_glottis_for, p_lips_back):
     
         theta            = self.__reflex*(p_in_forward[:-1] - p_in_backward_p1[1:])
@@ -206,6 +460,14 @@ class ReflexionCoef(object):
         
         return self.p_out_forward_p1, self.p_out_backward,
         
+    def propagation_full(self, p_in_forward, p_in_backward_p1):
+    
+        theta            = self.__reflex*(p_in_forward - p_in_backward_p1)
+        p_out_forward_p1 = p_in_forward + theta
+        p_out_backward   = p_in_backward_p1 + theta
+
+        return p_out_forward_p1, p_out_backward
+        
     def propagation_half(self, p_in_forward, p_in_backward_p1, i):
     
         theta            = self.__reflex[i::2]*(p_in_forward - p_in_backward_p1)
@@ -233,20 +495,26 @@ class LipsFR(object):
         
     """ Flanagan & Rabiner's (1972) model for lip reflexion/transmission """
     
-    def __init__(self, mouth):
+    def __init__(self, mouth, config=None):
         
+        self.__par          = cfg.get_config(config)
         self.mouth          = mouth
         self.__p_forward_mem = 0.
         self.__p_backward_mem = 0.
         self.__p_lips_mem    = 0.
 
         (self.nr, self.dr, self.nt, self.dt) = self.losses()
+
+    def set_mouth(self, mouth):
+
+        self.mouth = mouth
+        (self.nr, self.dr, self.nt, self.dt) = self.losses()
                     
     def losses(self):
 
         radi  = np.sqrt(self.mouth/np.pi)
-        r     = 128./(9.*np.pi*np.pi) *cfg.Param.CORR_LIPS
-        l     = 2.*cfg.Param.FS*(8.*radi)/(3.*np.pi*cfg.Constant.SOUND_SPEED)
+        r     = 128./(9.*np.pi*np.pi) *self.__par.CORR_LIPS
+        l     = 2.*self.__par.FS*(8.*radi)/(3.*np.pi*cfg.Constant.SOUND_SPEED)
 
         nr = np.array([-r - l + r*l, -r + l - r*l])
         dr = np.array([ r + l + r*l,  r - l - r*l])
@@ -271,116 +539,192 @@ class LipsFR(object):
  
         return p_backward, p_lips
 
+    def get_state(self):
+
+        return (self.__p_forward_mem, self.__p_backward_mem, self.__p_lips_mem)
+
+    def set_state(self, state):
+
+        (self.__p_forward_mem, self.__p_backward_mem, self.__p_lips_mem) = state
+
 
 class LipsSimple(object):
+
+    def __init__(self, config=None):
+
+        self.__par = cfg.get_config(config)
+
+    def set_mouth(self, mouth):
+
+        pass
     
     def propagation(self,p_forward_end,p_backward_end):
             
-        p_backward_new_end = cfg.Param.REFLEXION_LIPS*p_forward_end
-        p_lips = (1-cfg.Param.REFLEXION_LIPS)*p_forward_end
+        p_backward_new_end = self.__par.REFLEXION_LIPS*p_forward_end
+        p_lips = (1-self.__par.REFLEXION_LIPS)*p_forward_end
 
         return p_backward_new_end, p_lips
+
+    def get_state(self):
+
+        return ()
+
+    def set_state(self, state):
+
+        pass
         
 
 class DownstreamVT:
     
-    def __init__(self, area):
+    def __init__(self, area, config=None):
         
+        self.__par            = cfg.get_config(config)
 
         self.__ntubes         = area.size
-        self.__p_forward       = np.zeros(self.__ntubes)
-        self.__p_backward      = np.zeros(self.__ntubes)    
-        self.__p_forward_new   = np.zeros(self.__ntubes)
-        self.__p_backward_new  = np.zeros(self.__ntubes)    
+        self.__area           = np.array(area, dtype=float)
+        self.__p_forward       = np.zeros(self.__ntubes, self.__par.DTYPE)
+        self.__p_backward      = np.zeros(self.__ntubes, self.__par.DTYPE)    
+        self.__p_forward_new   = np.zeros(self.__ntubes, self.__par.DTYPE)
+        self.__p_backward_new  = np.zeros(self.__ntubes, self.__par.DTYPE)    
 
-        if cfg.Param.VISC_LOSS == True:
-            self.__vlosses = ViscousLosses(area)
+        if self.__par.VISC_LOSS == True:
+            self.__vlosses = ViscousLosses(area, self.__par)
             
-        if cfg.Param.WALL_VIBR == True:
-            self.__p_loss  = np.zeros(self.__ntubes)   
-            self.__junct   = WallVibration(area)
+        if self.__par.WALL_VIBR == True:
+            self.__p_loss  = np.zeros(self.__ntubes, self.__par.DTYPE)   
+            self.__junct   = WallVibration(area, self.__par)
         else:
-            self.__junct   = ReflexionCoef(area)            
+            self.__junct   = ReflexionCoef(area, self.__par.DTYPE)            
         
-        if cfg.Param.LIPS_FR == True:
-            self.__liptr   = LipsFR(area[-1])
+        if self.__par.LIPS_FR == True:
+            self.__liptr   = LipsFR(area[-1], self.__par)
         else:
-            self.__liptr   = LipsSimple()            
+            self.__liptr   = LipsSimple(self.__par)            
 
         self.__p_vt_glottis_back = 0.
         self.__p_vt_lips_back = 0.
+
+    def set_area(self, area, tubes=None):
+
+        """ Changes the area function (articulation). The coefficients of the given
+            tubes, by default those whose area changed, and of their junctions are
+            recomputed in place; the waves and filter memories are kept """
+
+        if tubes is None:
+            tubes = np.flatnonzero(area != self.__area)
+            if tubes.size == 0:
+                return
+
+        self.__area[tubes] = area[tubes]
+
+        self.__junct.set_area(self.__area, tubes)
+        if self.__par.VISC_LOSS == True:
+            self.__vlosses.set_area(self.__area, tubes)
+        if tubes[-1] == self.__ntubes - 1:
+            self.__liptr.set_mouth(self.__area[-1])
     
     def propagation(self, p_vt_glottis_for):
                                                         
-        p_in_forward      = self.__p_forward[:-1].copy()
-        p_in_backward_p1  = self.__p_backward[1:].copy()                
+        p_in_forward      = self.__p_forward[:-1]
+        p_in_backward_p1  = self.__p_backward[1:]
  
-        if cfg.Param.VISC_LOSS == True:                    
+        if self.__par.VISC_LOSS == True:                    
             (p_in_forward, 
              p_in_backward_p1) = self.__vlosses.addloss(p_in_forward, p_in_backward_p1)
            
-        if cfg.Param.WALL_VIBR == True:
-            p_in_loss           = self.__p_loss[:-1].copy()
-            (p_out_forward_p1, 
-             p_out_backward, 
-             p_out_loss)        = self.__junct.propagation(p_in_forward, p_in_backward_p1,
-                                                           p_in_loss)
-            self.__p_loss[:-1]  = p_out_loss
+        if self.__par.WALL_VIBR == True:
+            self.__junct.scatter(p_in_forward, p_in_backward_p1, self.__p_forward_new[1:],
+                                 self.__p_backward_new[:-1], self.__p_loss[:-1])
         else:
             (p_out_forward_p1, 
-             p_out_backward)    = self.__junct.propagation(p_in_forward, p_in_backward_p1)
+             p_out_backward)    = self.__junct.propagation_full(p_in_forward, p_in_backward_p1)
                     
-        self.__p_forward_new[1:]   = p_out_forward_p1
-        self.__p_backward_new[:-1] = p_out_backward
+            self.__p_forward_new[1:]   = p_out_forward_p1
+            self.__p_backward_new[:-1] = p_out_backward
        
         (self.__p_backward_new[-1],
          p_end)                    = self.__liptr.propagation(self.__p_forward[-1])
   
         self.__p_forward_new[0] = p_vt_glottis_for
         
-        self.__p_forward   = self.__p_forward_new.copy()
-        self.__p_backward  = self.__p_backward_new.copy()
+        # Every element of the new waves has been written: swap the buffers
         
+        (self.__p_forward, self.__p_forward_new)   = (self.__p_forward_new, self.__p_forward)
+        (self.__p_backward, self.__p_backward_new) = (self.__p_backward_new, self.__p_backward)
     
         return p_end, self.__p_backward[0]
         
     def propagation_half(self, p_vt_glottis_for):
         
+        # Half step i reads the forward waves of parity i and the backward waves of
+        # parity i + 1, and writes the others (the lips read a forward wave of parity
+        # i), so both wave arrays are updated in place
+        
+        p_forward  = self.__p_forward
+        p_backward = self.__p_backward
+        
         for i in range(2):                                
 
-            p_in_forward      = self.__p_forward[i:-1:2].copy()
-            p_in_backward_p1  = self.__p_backward[i+1::2].copy()                
+            p_in_forward      = p_forward[i:-1:2]
+            p_in_backward_p1  = p_backward[i+1::2]
                 
-            if cfg.Param.VISC_LOSS == True:                    
+            if self.__par.VISC_LOSS == True:                    
                 (p_in_forward, 
                  p_in_backward_p1) = self.__vlosses.addloss_half(p_in_forward, p_in_backward_p1,i)
                
-            if cfg.Param.WALL_VIBR == True:
-                p_in_loss           = self.__p_loss[i:-1:2].copy()
-                (p_out_forward_p1, 
-                 p_out_backward, 
-                 p_out_loss)        = self.__junct.propagation_half(p_in_forward, p_in_backward_p1,
-                                                               p_in_loss,i)
-                self.__p_loss[i:-1:2]  = p_out_loss
+            if self.__par.WALL_VIBR == True:
+                self.__junct.scatter_half(p_in_forward, p_in_backward_p1, self.__p_loss[i:-1:2],
+                                          p_forward[i+1::2], p_backward[i:-1:2], i)
             else:
                 (p_out_forward_p1, 
                  p_out_backward)    = self.__junct.propagation_half(p_in_forward, p_in_backward_p1,i)
                         
-            self.__p_forward_new[i+1::2]  = p_out_forward_p1
-            self.__p_backward_new[i:-1:2] = p_out_backward
+                p_forward[i+1::2]  = p_out_forward_p1
+                p_backward[i:-1:2] = p_out_backward
            
             
             if (self.__ntubes % 2) == (1 - i):   
-                (self.__p_backward_new[-1],
-                 p_end)                    = self.__liptr.propagation(self.__p_forward[-1])
+                (p_backward[-1],
+                 p_end)                    = self.__liptr.propagation(p_forward[-1])
             if i == 1:      
-                self.__p_forward_new[0] = p_vt_glottis_for
-            
-            self.__p_forward   = self.__p_forward_new.copy()
-            self.__p_backward  = self.__p_backward_new.copy()
+                p_forward[0] = p_vt_glottis_for
         
     
-        return p_end, self.__p_backward[0]
+        return p_end, p_backward[0]
+
+    def get_state(self):
+
+        state = {"waves": (self.__p_forward.copy(), self.__p_backward.copy(),
+                           self.__p_forward_new.copy(), self.__p_backward_new.copy()),
+                 "lips":  self.__liptr.get_state()}
+
+        if self.__par.VISC_LOSS == True:
+            state["visc"] = self.__vlosses.get_state()
+        if self.__par.WALL_VIBR == True:
+            state["wall"] = (self.__p_loss.copy(), self.__junct.get_state())
+
+        return state
+
+    def set_state(self, state):
+
+        (self.__p_forward, self.__p_backward,
+         self.__p_forward_new, self.__p_backward_new) = (wave.copy() for wave in state["waves"])
+
+        self.__liptr.set_state(state["lips"])
+
+        if self.__par.VISC_LOSS == True:
+            self.__vlosses.set_state(state["visc"])
+        if self.__par.WALL_VIBR == True:
+            self.__p_loss = state["wall"][0].copy()
+            self.__junct.set_state(state["wall"][1])
+
+    def get_parts(self):
+
+        """ Viscous losses (or None), junctions (WallVibration or ReflexionCoef) and
+            lips of the tract, for the stage profile (profiler.py) """
+
+        return (self.__vlosses if self.__par.VISC_LOSS == True else None,
+                self.__junct, self.__liptr)
 
     def propagation_halfNEW(self,p_vt_glottis_for):
              
@@ -404,17 +748,267 @@ class DownstreamVT:
     
         return p_end, self.__p_backward[0]
 
+# Parameters that define the vocal tract responses, besides the area function
+
+TRACT_KEYS = ("FS", "HALF_SAMPLING", "LTUBE", "LIPS_FR", "CORR_LIPS", "REFLEXION_LIPS",
+              "VISC_LOSS", "NVOCAL", "CORR_LOSS", "WALL_VIBR", "LP", "RP")
+
+_responses      = collections.OrderedDict()
+_responses_lock = threading.Lock()
+
+
+def get_tract_responses(area, config=None, max_time=0.5, tolerance=1e-16):
+
+    """ Impulse responses of DownstreamVT from the forward wave at the glottis to the
+        output at the lips (row 0) and to the backward wave at the glottis (row 1),
+        truncated where the energy left is below tolerance times the total, and at
+        most max_time s long. Computed once per area function and tract options """
+
+    par   = cfg.get_config(config)
+    area  = np.asarray(area, dtype=float)
+    key   = (area.tobytes(), max_time, tolerance) + tuple(getattr(par, name) for name in TRACT_KEYS)
+
+    with _responses_lock:
+        if key in _responses:
+            _responses.move_to_end(key)
+            return _responses[key]
+
+    # The wave-digital tract is linear and time-invariant, and starts at rest
+
+    tract  = DownstreamVT(area, par.replace(DTYPE="float64"))
+    step   = tract.propagation_half if par.HALF_SAMPLING == "Yes" else tract.propagation
+    nmax   = max(1, int(max_time*par.FS))
+    chunk  = 1024
+    h      = np.zeros((2, nmax))
+
+    for n in range(nmax):
+        h[:, n] = step(1. if n == 0 else 0.)
+        if (n + 1) % chunk == 0 and n + 1 > chunk:
+            energy = np.sum(h[:, :n + 1]**2)
+            if np.sum(h[:, n + 1 - chunk:n + 1]**2) < tolerance*energy:
+                h = h[:, :n + 1]
+                break
+
+    tail   = np.cumsum(np.sum(h**2, axis=0)[::-1])[::-1]
+    length = max(1, int(np.sum(tail >= tolerance*tail[0])))
+    h      = h[:, :length]
+    h.flags.writeable = False
+
+    with _responses_lock:
+        _responses[key] = h
+        while len(_responses) > 32:
+            _responses.popitem(last=False)
+
+    return h
+
+
+def get_glottal_load(area, config=None, max_time=0.5, tolerance=1e-16):
+
+    """ Pole a and gain b of the one-pole glottal load b/(1 - a z^-1) of the
+        uncoupled approximation: the reflectance with the sum (b/(1 - a)) and the
+        mean delay (a/(1 - a) samples) of the tract reflectance at the glottis of
+        get_tract_responses, so the same inertance at low frequencies """
+
+    h     = get_tract_responses(area, config, max_time, tolerance)[1]
+    r0    = np.sum(h)
+    delay = max(np.dot(np.arange(h.size), h)/r0, 0.) if r0 != 0. else 0.
+    pole  = delay/(1. + delay)
+
+    return pole, (1. - pole)*r0
+
+
+class ReflectanceVT(object):
+
+    """ Vocal tract as two precomputed impulse responses of the forward wave at the
+        glottis: the glottis-facing reflectance (backward wave at the glottis) and
+        the transfer to the lips output, with the lips radiation and the viscous and
+        wall losses included. Between the glottis and the lips the tract is linear
+        and time-invariant; only the glottal junction (VFmodel._flow) is not, and it
+        stays in the sample loop.
+
+        Both responses are evaluated by uniformly partitioned convolution: the
+        first head taps directly every sample, and the rest in partitions of head
+        taps by FFT every head samples, with a frequency-domain delay line of the
+        input blocks. The per-sample cost depends on head and on the response
+        length, not on the number of tubes or on the losses.
+
+        The truncation leaves out the energy below tolerance. With wall vibration
+        and half sampling the waveguide has a weakly damped component at about
+        FS/2, which is cut at max_time. """
+
+    def __init__(self, area, config=None, head=64, max_time=0.5, tolerance=1e-16):
+
+        self.__par    = cfg.get_config(config)
+        self.__head   = head
+
+        h             = get_tract_responses(area, self.__par, max_time, tolerance)
+        self.length   = h.shape[1]
+
+        nparts        = max(1, -(-(self.length - head)//head))
+        h             = np.hstack((h, np.zeros((2, head*(nparts + 1) - self.length))))
+
+        # Head taps reversed, against the input in chronological order; tail
+        # partitions as spectra of 2*head points
+
+        self.__h_head = np.ascontiguousarray(h[:, head - 1::-1])
+        tail          = h[:, head:].reshape(2, nparts, head).transpose(1, 0, 2)
+        self.__h_tail = np.fft.rfft(tail, 2*head)
+        self.__nparts = nparts
+
+        # Input of the previous and current blocks; spectra of the last nparts
+        # blocks in a ring written twice (newest first at [k, k + nparts)); tail
+        # output of the current block and overlap into the next one
+
+        self.__x      = np.zeros(2*head)
+        self.__fdl    = np.zeros((2*nparts, head + 1), complex)
+        self.__y_tail = np.zeros((2, head))
+        self.__carry  = np.zeros((2, head))
+        self.__j      = 0
+        self.__k      = 0
+
+    def propagation(self, p_vt_glottis_for):
+
+        head = self.__head
+        j    = self.__j
+
+        self.__x[head + j] = p_vt_glottis_for
+        (p_end, p_back)    = np.dot(self.__h_head, self.__x[j + 1:j + 1 + head]) + \
+                             self.__y_tail[:, j]
+
+        if j == head - 1:
+            self._block()
+            j = -1
+        self.__j = j + 1
+
+        return p_end, p_back
+
+    # Same step at both sampling rates
+
+    propagation_half = propagation
+
+    def _block(self):
+
+        """ Adds the last input block to the delay line and computes the tail output
+            of the next block """
+
+        head   = self.__head
+        nparts = self.__nparts
+        k      = (self.__k - 1) % nparts
+
+        spectrum                = np.fft.rfft(self.__x[head:], 2*head)
+        self.__fdl[k]           = spectrum
+        self.__fdl[k + nparts]  = spectrum
+        self.__k                = k
+
+        y = np.fft.irfft(np.einsum("pf,pcf->cf", self.__fdl[k:k + nparts], self.__h_tail),
+                         2*head)
+
+        self.__y_tail = y[:, :head] + self.__carry
+        self.__carry  = y[:, head:]
+        self.__x[:head] = self.__x[head:]
+
+    def get_state(self):
+
+        return {"input": self.__x.copy(), "fdl": self.__fdl.copy(),
+                "tail": (self.__y_tail.copy(), self.__carry.copy()),
+                "position": (self.__j, self.__k)}
+
+    def set_state(self, state):
+
+        self.__x                      = state["input"].copy()
+        self.__fdl                    = state["fdl"].copy()
+        (self.__y_tail, self.__carry) = (tail.copy() for tail in state["tail"])
+        (self.__j, self.__k)          = state["position"]
+
+
+class UncoupledTract(object):
+
+    """ Vocal tract as a fixed linear filter of the glottal flow, for the uncoupled
+        source-filter approximation (config UNCOUPLED). The source sees a
+        low-order load in place of the tract: a one-pole reflectance with the gain
+        and the mean delay of the tract reflectance at the glottis, so the same
+        inertance at low frequencies, which skews the flow pulse, but no formants
+        (glottal_load). The tract, closed at the glottis by the reflexion
+        coefficient glottal_reflexion, filters the flow afterwards. The filter
+        comes from the responses of get_tract_responses, so it includes the losses
+        and the lips radiation, and is applied by FFT in blocks of any size. """
+
+    def __init__(self, area, config=None, glottal_reflexion=1., max_time=0.5,
+                 tolerance=1e-16):
+
+        self.__par = cfg.get_config(config)
+
+        # Forward wave entering the tract per unit flow, as in VFmodel._flow
+
+        aw         = self.__par.CORR_COUPLING*area[0]
+        gain       = cfg.Constant.SOUND_SPEED*cfg.Constant.DENSITY_AIR/aw
+
+        # Lips output per unit forward wave, with the backward wave reflected back
+        # into the tract at the glottis: T/(1 - r R)
+
+        h          = get_tract_responses(area, self.__par, max_time, tolerance)
+        nfft       = 2**int(np.ceil(np.log2(max(h.shape[1], int(max_time*self.__par.FS)))) + 1)
+        spectra    = np.fft.rfft(h, nfft)
+        g          = np.fft.irfft(gain*spectra[0]/(1. - glottal_reflexion*spectra[1]), nfft)
+
+        tail       = np.cumsum((g**2)[::-1])[::-1]
+        self.response = g[:max(1, int(np.sum(tail >= tolerance*tail[0])))]
+
+        (self.load_pole, self.load_gain) = get_glottal_load(area, self.__par, max_time,
+                                                           tolerance)
+
+        self.__spectra = {}
+        self.reset()
+
+    def reset(self):
+
+        self.__carry = np.zeros(self.response.size - 1)
+
+    def glottal_load(self, p_vt_glottis_for, p_vt_glottis_back):
+
+        """ Backward wave at the glottis for the forward wave entering the tract,
+            given the previous backward wave (the state of the load) """
+
+        return self.load_pole*p_vt_glottis_back + self.load_gain*p_vt_glottis_for
+
+    def process(self, ug):
+
+        """ Lips output for the next block of glottal flow samples """
+
+        x    = np.asarray(ug, dtype=float)
+        size = x.size + self.response.size - 1
+        nfft = 2**int(np.ceil(np.log2(size)))
+
+        if nfft not in self.__spectra:
+            self.__spectra[nfft] = np.fft.rfft(self.response, nfft)
+
+        y    = np.fft.irfft(np.fft.rfft(x, nfft)*self.__spectra[nfft], nfft)[:size]
+        y[:self.__carry.size] += self.__carry
+        self.__carry = y[x.size:]
+
+        return y[:x.size]
+
+    def get_state(self):
+
+        return self.__carry.copy()
+
+    def set_state(self, state):
+
+        self.__carry = state.copy()
+
+
 class UpstreamVT:
     
-    def __init__(self, area, pl):
+    def __init__(self, area, pl, config=None):
         
+        self.__par             = cfg.get_config(config)
         self.__ntubes          = area.size
-        self.__p_forward       = np.zeros(self.__ntubes)
-        self.__p_backward      = np.zeros(self.__ntubes)
-        self.__p_forward_new   = np.zeros(self.__ntubes)
-        self.__p_backward_new  = np.zeros(self.__ntubes)    
+        self.__p_forward       = np.zeros(self.__ntubes, self.__par.DTYPE)
+        self.__p_backward      = np.zeros(self.__ntubes, self.__par.DTYPE)
+        self.__p_forward_new   = np.zeros(self.__ntubes, self.__par.DTYPE)
+        self.__p_backward_new  = np.zeros(self.__ntubes, self.__par.DTYPE)    
 
-        self.__junct = ReflexionCoef(area)       
+        self.__junct = ReflexionCoef(area, self.__par.DTYPE)       
             
         self.__p_tr_lungs_back = pl
     
@@ -428,7 +1022,16 @@ class UpstreamVT:
         self.__p_forward   = p_forward_new.copy()
         self.__p_backward  = p_backward_new.copy()
                 
-        self.__p_tr_lungs_back = pl - cfg.Param.REFLEXION_LUNGS*self.__p_forward[-1]            
+        self.__p_tr_lungs_back = pl - self.__par.REFLEXION_LUNGS*self.__p_forward[-1]            
          
         return self.__p_backward[0]
-        
\ No newline at end of file
+
+    def get_state(self):
+
+        return (self.__p_forward.copy(), self.__p_backward.copy(), self.__p_tr_lungs_back)
+
+    def set_state(self, state):
+
+        self.__p_forward       = state[0].copy()
+        self.__p_backward      = state[1].copy()
+        self.__p_tr_lungs_back = state[2]
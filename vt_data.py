@@ -14,13 +14,15 @@ import matplotlib.pyplot as plt
 
 class MakeVT(object):
 
-    def __init__(self) :
+    def __init__(self, config=None) :
 
-        if cfg.Param.VT_TYPE == "Cos":
+        self.__par = cfg.get_config(config)
+
+        if self.__par.VT_TYPE == "Cos":
             
             self.AREA = self._get_area_par()
 
-        elif cfg.Param.VT_TYPE == "Maeda":
+        elif self.__par.VT_TYPE == "Maeda":
             
             self.AREA = self._get_maeda()
             
@@ -34,13 +36,13 @@ class MakeVT(object):
         
     def _trachea(self):
         
-        tubes         = int(cfg.Param.LENGTH_TRACHEA/cfg.Param.LTUBE_TRACHEA)
-        area_trachea  = cfg.Param.AREA_TRACHEA*np.ones(tubes)
-        alfa          = 4.*np.pi*cfg.Param.FCUT_BRONQUI/cfg.Constant.SOUND_SPEED
-        x             = np.linspace(0,cfg.Param.LENGTH_BRONQUI,
-                                    int(cfg.Param.LENGTH_BRONQUI/cfg.Param.LTUBE_TRACHEA))
-        area_lungs   = cfg.Param.AREA_TRACHEA*np.exp(alfa*x) 
-        area         = cfg.Param.GENDER_SCALE*np.hstack((area_trachea,area_lungs))
+        tubes         = int(self.__par.LENGTH_TRACHEA/self.__par.LTUBE_TRACHEA)
+        area_trachea  = self.__par.AREA_TRACHEA*np.ones(tubes)
+        alfa          = 4.*np.pi*self.__par.FCUT_BRONQUI/cfg.Constant.SOUND_SPEED
+        x             = np.linspace(0,self.__par.LENGTH_BRONQUI,
+                                    int(self.__par.LENGTH_BRONQUI/self.__par.LTUBE_TRACHEA))
+        area_lungs   = self.__par.AREA_TRACHEA*np.exp(alfa*x) 
+        area         = self.__par.GENDER_SCALE*np.hstack((area_trachea,area_lungs))
         
         return area
         
@@ -57,13 +59,13 @@ class MakeVT(object):
 
     def _get_area(self):
 
-        if cfg.Param.VT_FILE[-3:]== 'txt':
-            area = np.loadtxt("vocaltracts/" + cfg.Param.VT_FILE)
+        if self.__par.VT_FILE[-3:]== 'txt':
+            area = np.loadtxt("vocaltracts/" + self.__par.VT_FILE)
         else:
-            npzfile = np.load("vocaltracts/" + cfg.Param.VT_FILE)
+            npzfile = np.load("vocaltracts/" + self.__par.VT_FILE)
             area    = npzfile['arr_0']  
         
-        if cfg.Param.SAMPLING_MODE == 2:
+        if self.__par.SAMPLING_MODE == 2:
             a = len(area)
             if (a % 2) == 1:
                 a -= 1
@@ -73,9 +75,9 @@ class MakeVT(object):
         
     def _get_maeda(self):
 
-        area    = cfg.Param.AREA_VT
+        area    = self.__par.AREA_VT
         
-        if cfg.Param.SAMPLING_MODE == 2:
+        if self.__par.SAMPLING_MODE == 2:
             a = len(area)
             if (a % 2) == 1:
                 a -= 1
@@ -113,8 +115,8 @@ class MakeVT(object):
         
         vl      = len(area)
         l       = np.zeros(2*vl)
-        l[::2]  = np.linspace(0,(vl-1)*cfg.Param.LTUBE,vl)
-        l[1::2] = l[::2] + cfg.Param.LTUBE            
+        l[::2]  = np.linspace(0,(vl-1)*self.__par.LTUBE,vl)
+        l[1::2] = l[::2] + self.__par.LTUBE            
         w       = np.zeros(2*vl)
         w[::2]  = area
         w[1::2] = area
@@ -123,13 +125,13 @@ class MakeVT(object):
         
     def _get_area_par(self):
 
-        npzfile = np.load("vocaltracts/" + cfg.Param.VT_FILE)
+        npzfile = np.load("vocaltracts/" + self.__par.VT_FILE)
                 
         leng      = npzfile['arr_0']
         c         = npzfile['arr_1']
         nbasis    = len(c)
 
-        nsect     = int(round(leng/cfg.Param.LTUBE))
+        nsect     = int(round(leng/self.__par.LTUBE))
         newlength = np.linspace(0, 1, nsect + 1)
         B         = np.ones((nsect+1, nbasis))
     
@@ -140,7 +142,7 @@ class MakeVT(object):
         area      = np.exp(log_area)
         tube_area = (area[:-1] + area[1:])/2.
         
-        if cfg.Param.GRAPHICS == True:
+        if self.__par.GRAPHICS == True:
             self._plot_vt2(leng,c,nbasis,nsect,tube_area)
  
         return tube_area
@@ -165,8 +167,8 @@ class MakeVT(object):
         
         vl      = len(tube_area)
         l       = np.zeros(2*vl)
-        l[::2]  = np.linspace(0,(vl-1)*(cfg.Param.LTUBE),vl)
-        l[1::2] = l[::2] + cfg.Param.LTUBE           
+        l[::2]  = np.linspace(0,(vl-1)*(self.__par.LTUBE),vl)
+        l[1::2] = l[::2] + self.__par.LTUBE           
         w       = np.zeros(2*vl)
         w[::2]  = tube_area
         w[1::2] = tube_area
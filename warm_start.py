@@ -0,0 +1,118 @@
+# -*- coding: utf-8 -*-
+
+"""
+Warm-start store of the voicing onset.
+
+The onset (the rise of lung pressure over TIME_ONSET) is the same for every run
+with the same source, vocal tract and seed, whatever the duration, offset or
+prosody of the rest of the voice. WarmStartStore keeps the complete simulation
+state at the end of the onset, together with the onset signals, so that later
+runs with the same key skip it and resume from there. A warm run gives the same
+samples and measures as a cold one.
+
+The key is the SHA-256 of the resolved configuration without the parameters that
+only act after the onset (POST_ONSET_KEYS), of the onset control samples and of
+the code version. Only reproducible runs qualify (see result_cache.is_deterministic).
+
+Example:
+    >>> store = WarmStartStore()
+    >>> p1 = syn.Synthesis(config, warm_store=store).get_voice()       # stores the onset
+    >>> p2 = syn.Synthesis(config.replace(TIME_TOTAL=3.), warm_store=store).get_voice()
+"""
+
+import threading
+import collections
+import numpy             as np
+import result_cache      as rc
+
+
+# Parameters that do not change the simulation before the end of the onset
+
+POST_ONSET_KEYS = ("TIME_TOTAL", "TIME_OFFSET", "TIME_FINAL", "PROSODY", "MAXFREQ",
+                   "PROFILE_EVERY")
+
+
+def onset_key(config, controls, nonset):
+
+    """ Key of the state after the first nonset samples of a run of config with the
+        control trajectories controls = (pl, abduction, stiffness), or None when the
+        run is not reproducible """
+
+    if not rc.is_deterministic(config):
+        return None
+
+    extra = b"".join(np.ascontiguousarray(signal[:nonset]).tobytes() for signal in controls)
+
+    return rc.cache_key(config, exclude=POST_ONSET_KEYS, extra=extra)
+
+
+def _nbytes(entry):
+
+    (state, signals) = entry
+
+    return sum(signal.nbytes for signal in signals)
+
+
+class WarmStartStore(object):
+
+    def __init__(self, max_memory_bytes=64*2**20):
+
+        """ In-memory LRU store of onset states, bounded by the size of the onset signals """
+
+        self.__max_memory_bytes = max_memory_bytes
+        self.__entries          = collections.OrderedDict()
+        self.__memory_bytes     = 0
+        self.__lock             = threading.Lock()
+        self.__stats            = {"hits": 0, "misses": 0}
+
+    def get(self, key):
+
+        """ (state, signals) stored for key, or None. The signal arrays are read-only """
+
+        with self.__lock:
+            if key not in self.__entries:
+                self.__stats["misses"] += 1
+                return None
+            self.__entries.move_to_end(key)
+            self.__stats["hits"] += 1
+            return self.__entries[key][0]
+
+    def put(self, key, state, signals):
+
+        """ Stores the state at the end of the onset and the onset signals
+            (p_end, wg, ag, ug), which are copied """
+
+        signals = tuple(np.array(signal) for signal in signals)
+        for signal in signals:
+            signal.flags.writeable = False
+
+        entry  = (state, signals)
+        nbytes = _nbytes(entry)
+        if nbytes > self.__max_memory_bytes:
+            return
+
+        with self.__lock:
+            if key in self.__entries:
+                self.__memory_bytes -= self.__entries.pop(key)[1]
+
+            self.__entries[key]  = (entry, nbytes)
+            self.__memory_bytes += nbytes
+
+            while self.__memory_bytes > self.__max_memory_bytes:
+                (_, (_, old_nbytes)) = self.__entries.popitem(last=False)
+                self.__memory_bytes -= old_nbytes
+
+    def clear(self):
+
+        with self.__lock:
+            self.__entries.clear()
+            self.__memory_bytes = 0
+
+    def get_stats(self):
+
+        with self.__lock:
+            stats = dict(self.__stats)
+            stats["entries"]      = len(self.__entries)
+            stats["memory_bytes"] = self.__memory_bytes
+
+        return stats